@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Title: LDL Particle Morphology Analysis
+Date: October 2026
+Description:
+    This module is a Python port of LDL_diameterANDeccentricity.m. It measures the diameter and eccentricity
+    of LDL particles in a stack of 2D class averages or particle images, processing the stack in chunks
+    without per-image plotting
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from scipy import ndimage
+from scipy.cluster.vq import kmeans2
+
+# MRC data modes and the NumPy types they are stored as
+MRC_MODE_DTYPES = {0: np.int8, 1: np.int16, 2: np.float32, 6: np.uint16, 12: np.float16}
+
+#######################################################################################
+def read_mrc_stack(mrc_file_path):
+    """
+    Memory-maps the image data of an MRC stack without reading it into memory.
+
+    Args:
+        mrc_file_path (str): The path to the .mrc/.mrcs file.
+
+    Returns:
+        np.memmap: Read-only array of shape (n_images, ny, nx).
+    """
+    header = np.fromfile(mrc_file_path, dtype=np.uint8, count=1024)
+    if len(header) < 1024:
+        raise ValueError(f"{mrc_file_path} is too short to be an MRC file.")
+
+    # Machine stamp 0x44 0x41 (or 0x44 0x44) means little-endian, 0x11 0x11 big-endian
+    byte_order = '>' if header[212] == 0x11 else '<'
+    nx, ny, nz, mode = np.frombuffer(header[:16].tobytes(), dtype=f'{byte_order}i4')
+    extended_header_bytes = int(np.frombuffer(header[92:96].tobytes(), dtype=f'{byte_order}i4')[0])
+
+    if mode not in MRC_MODE_DTYPES:
+        raise ValueError(f"Unsupported MRC mode {mode}.")
+    dtype = np.dtype(MRC_MODE_DTYPES[mode]).newbyteorder(byte_order)
+
+    return np.memmap(mrc_file_path, dtype=dtype, mode='r', offset=1024 + extended_header_bytes,
+                     shape=(int(nz), int(ny), int(nx)))
+
+#######################################################################################
+def otsu_binarize(images, n_bins=256):
+    """
+    Binarizes every image of a stack with its own Otsu threshold, computed for all images at once from
+    per-image 256-bin histograms (the method used by MATLAB's imbinarize).
+
+    Args:
+        images (np.ndarray): Image stack of shape (n_images, ny, nx).
+        n_bins (int): Number of histogram bins spanning each image's intensity range.
+
+    Returns:
+        np.ndarray: Boolean masks of shape (n_images, ny, nx), True above each image's threshold.
+    """
+    images = np.asarray(images, dtype=np.float32)
+    n_images = len(images)
+
+    # Bin every pixel against its own image's intensity range
+    low = images.min(axis=(1, 2), keepdims=True)
+    span = images.max(axis=(1, 2), keepdims=True) - low
+    bins = np.floor((images - low) / np.where(span > 0, span, 1) * (n_bins - 1e-3)).astype(np.int64)
+    hist = np.bincount((np.arange(n_images)[:, None, None] * n_bins + bins).ravel(),
+                       minlength=n_images * n_bins).reshape(n_images, n_bins)
+
+    # Between-class variance for every candidate threshold bin, maximized per image
+    probabilities = hist / hist.sum(axis=1, keepdims=True)
+    omega = np.cumsum(probabilities, axis=1)
+    mu = np.cumsum(probabilities * np.arange(n_bins), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        between_variance = (mu[:, -1:] * omega - mu) ** 2 / (omega * (1 - omega))
+    thresholds = np.argmax(np.nan_to_num(between_variance, nan=-1.0), axis=1)
+
+    return bins > thresholds[:, None, None]
+
+#######################################################################################
+def largest_components(masks):
+    """
+    Keeps only the largest 8-connected component of every mask in a stack, labelling the whole stack in one
+    call with a structuring element that does not connect neighbouring images.
+
+    Args:
+        masks (np.ndarray): Boolean masks of shape (n_images, ny, nx).
+
+    Returns:
+        np.ndarray: Boolean masks of the same shape holding only each image's largest component.
+    """
+    structure = np.zeros((3, 3, 3), dtype=bool)
+    structure[1] = True
+    labels, n_labels = ndimage.label(masks, structure=structure)
+
+    # Image that each label belongs to, and the largest label per image (ties go to the lowest label)
+    sizes = np.bincount(labels.ravel(), minlength=n_labels + 1)
+    label_images = np.zeros(n_labels + 1, dtype=np.int64)
+    label_images[labels] = np.arange(len(masks))[:, None, None]
+    order = np.lexsort((np.arange(1, n_labels + 1), -sizes[1:], label_images[1:])) + 1
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = label_images[order[1:]] != label_images[order[:-1]]
+
+    keep = np.zeros(n_labels + 1, dtype=bool)
+    keep[order[first]] = True
+    return keep[labels]
+
+#######################################################################################
+def region_moments(masks):
+    """
+    Computes regionprops-style ellipse properties of one region per mask from its second central moments.
+
+    Args:
+        masks (np.ndarray): Boolean masks of shape (n_images, ny, nx), one region per image.
+
+    Returns:
+        dict: Arrays (one value per image, NaN for empty masks) for 'Centroid X', 'Centroid Y',
+              'Major Axis Length', 'Minor Axis Length' (pixels), 'Eccentricity' and 'Orientation' (degrees).
+    """
+    masks = np.asarray(masks, dtype=np.float64)
+    y = np.arange(masks.shape[1], dtype=np.float64)[:, None] + 1
+    x = np.arange(masks.shape[2], dtype=np.float64)[None, :] + 1
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n_pixels = masks.sum(axis=(1, 2))
+        x_bar = (masks * x).sum(axis=(1, 2)) / n_pixels
+        y_bar = (masks * y).sum(axis=(1, 2)) / n_pixels
+        dx = x - x_bar[:, None, None]
+        dy = -(y - y_bar[:, None, None])  # image rows point down; regionprops measures y upwards
+
+        # Normalized second central moments of a uniform pixel (1/12 added as regionprops does)
+        uxx = (masks * dx ** 2).sum(axis=(1, 2)) / n_pixels + 1 / 12
+        uyy = (masks * dy ** 2).sum(axis=(1, 2)) / n_pixels + 1 / 12
+        uxy = (masks * dx * dy).sum(axis=(1, 2)) / n_pixels
+        common = np.sqrt((uxx - uyy) ** 2 + 4 * uxy ** 2)
+
+        major = 2 * np.sqrt(2) * np.sqrt(uxx + uyy + common)
+        minor = 2 * np.sqrt(2) * np.sqrt(uxx + uyy - common)
+        eccentricity = 2 * np.sqrt((major / 2) ** 2 - (minor / 2) ** 2) / major
+
+        numerator = np.where(uyy > uxx, uyy - uxx + common, 2 * uxy)
+        denominator = np.where(uyy > uxx, 2 * uxy, uxx - uyy + common)
+        orientation = np.where((numerator == 0) & (denominator == 0), 0.0,
+                               np.degrees(np.arctan(numerator / denominator)))
+
+    return {
+        'Centroid X': x_bar,
+        'Centroid Y': y_bar,
+        'Major Axis Length': major,
+        'Minor Axis Length': minor,
+        'Eccentricity': eccentricity,
+        'Orientation': np.where(n_pixels > 0, orientation, np.nan)
+    }
+
+#######################################################################################
+def _measure_chunk(mrc_file_path, start, stop):
+    """
+    Measures images [start, stop) of an MRC stack. Runs in worker processes, which memory-map the stack themselves.
+    """
+    images = read_mrc_stack(mrc_file_path)[start:stop]
+    return region_moments(largest_components(otsu_binarize(images)))
+
+#######################################################################################
+def measure_ldl_stack(mrc_file_path, apix=1.916015625, chunk_size=512, n_workers=None):
+    """
+    Measures the largest particle in every image of an MRC stack: binarizes each image with Otsu's method,
+    keeps its largest connected component and fits an ellipse from the component's moments.
+
+    Args:
+        mrc_file_path (str): The path to the .mrc/.mrcs stack.
+        apix (float): Pixel size in Angstroms.
+        chunk_size (int): Number of images processed together in one vectorized chunk.
+        n_workers (int, optional): Number of worker processes; None uses every CPU and 1 runs in this process.
+
+    Returns:
+        pd.DataFrame: One row per image with 'Image' (1-based, as in the MATLAB script), 'Diameter',
+                      'Average Diameter', 'Major Axis Length' and 'Minor Axis Length' in Angstroms, and
+                      'Eccentricity', 'Orientation' (degrees), 'Centroid X' and 'Centroid Y' (pixels).
+    """
+    n_images = len(read_mrc_stack(mrc_file_path))
+    starts = list(range(0, n_images, chunk_size))
+    stops = [min(start + chunk_size, n_images) for start in starts]
+
+    if n_workers == 1 or len(starts) <= 1:
+        results = [_measure_chunk(mrc_file_path, start, stop) for start, stop in zip(starts, stops)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count()) as executor:
+            results = list(executor.map(_measure_chunk, [mrc_file_path] * len(starts), starts, stops))
+
+    if results:
+        moments = {key: np.concatenate([result[key] for result in results]) for key in results[0]}
+    else:
+        moments = region_moments(np.zeros((0, 1, 1), dtype=bool))
+
+    major_lengths = moments['Major Axis Length'] * apix
+    minor_lengths = moments['Minor Axis Length'] * apix
+    morphology_df = pd.DataFrame({
+        'Image': np.arange(1, n_images + 1),
+        'Diameter': major_lengths,
+        'Average Diameter': (major_lengths + minor_lengths) / 2,
+        'Major Axis Length': major_lengths,
+        'Minor Axis Length': minor_lengths,
+        'Eccentricity': moments['Eccentricity'],
+        'Orientation': moments['Orientation'],
+        'Centroid X': moments['Centroid X'],
+        'Centroid Y': moments['Centroid Y']
+    })
+
+    return morphology_df
+
+#######################################################################################
+def cluster_by_axis_lengths(morphology_df, num_clusters=10, seed=0):
+    """
+    Clusters images with k-means on their major and minor axis lengths and picks, for each cluster,
+    the image closest to the cluster centroid.
+
+    Args:
+        morphology_df (pd.DataFrame): Output of measure_ldl_stack.
+        num_clusters (int): Number of k-means clusters.
+        seed (int): Random seed for the k-means initialization.
+
+    Returns:
+        tuple: Cluster number per image (1-based), the centroids as an array of shape (num_clusters, 2) and the
+               representative 'Image' number of each cluster.
+    """
+    data = morphology_df[['Major Axis Length', 'Minor Axis Length']].to_numpy(dtype=float)
+    centroids, labels = kmeans2(data, num_clusters, minit='++', seed=seed)
+
+    distances = np.linalg.norm(data[None, :, :] - centroids[:, None, :], axis=2)
+    representatives = morphology_df['Image'].to_numpy()[np.argmin(distances, axis=1)]
+
+    return labels + 1, centroids, representatives
+
+#######################################################################################
+def group_by_major_axis(morphology_df, num_groups=10):
+    """
+    Divides images into equal-width bins of major axis length, as MATLAB's histcounts does.
+
+    Args:
+        morphology_df (pd.DataFrame): Output of measure_ldl_stack.
+        num_groups (int): Number of bins.
+
+    Returns:
+        np.ndarray: Group number (1-based) of every image.
+    """
+    major_lengths = morphology_df['Major Axis Length'].to_numpy(dtype=float)
+    edges = np.histogram_bin_edges(major_lengths[~np.isnan(major_lengths)], bins=num_groups)
+
+    # Interior edges only, so the largest value falls in the last bin
+    return np.searchsorted(edges[1:-1], major_lengths, side='right') + 1
+
+#######################################################################################
+def plot_morphology_summary(morphology_df):
+    """
+    Plots the summary figures of the MATLAB script: histograms of average diameter and eccentricity and
+    scatter plots of major vs minor axis length and average diameter vs eccentricity.
+
+    Args:
+        morphology_df (pd.DataFrame): Output of measure_ldl_stack.
+
+    Returns:
+        matplotlib.figure.Figure: The figure holding the four panels.
+    """
+    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+
+    axes[0, 0].hist(morphology_df['Average Diameter'].dropna(), bins='auto')
+    axes[0, 0].set_xlabel('Average Diameter (Å)')
+    axes[0, 0].set_ylabel('Count')
+    axes[0, 0].set_title('Histogram of Diameter')
+
+    axes[0, 1].hist(morphology_df['Eccentricity'].dropna(), bins='auto')
+    axes[0, 1].set_xlabel('Eccentricity')
+    axes[0, 1].set_ylabel('Count')
+    axes[0, 1].set_title('Histogram of Eccentricity')
+
+    axes[1, 0].scatter(morphology_df['Major Axis Length'], morphology_df['Minor Axis Length'])
+    axes[1, 0].set_xlabel('Major Axis Length (Å)')
+    axes[1, 0].set_ylabel('Minor Axis Length (Å)')
+
+    axes[1, 1].scatter(morphology_df['Average Diameter'], morphology_df['Eccentricity'])
+    axes[1, 1].set_xlabel('Average Diameter (Å)')
+    axes[1, 1].set_ylabel('Eccentricity')
+
+    return fig
@@ -9,23 +9,384 @@ Description:
     This module contains all the functions used in the analysis script
 """
 
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
+# apoB100 protein sequence (UniProt P04114, including the signal peptide)
+APOB100_SEQUENCE = 'MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEVPQLCSFILKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYELKLAIPEGKQVFLYPEKDEPTYILNIKRGIISALLVPPETEEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLGQCDRFKPIRTGISPLALIKGMTRPLSTLISSSQSCQYTLDAKRKHVAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKINSRFFGEGTKKMGLAFESTKSTSPPKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGLSDEAVTSLLPQLIEVSSPITLQALVQCGQPQCSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREIFNMARDQRSRATLYALSHAVNNYHKTNPTGTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQTMEQLTPELKSSILKCVQSTKPSLMIQKAAIQALRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPSQADINKIVQILPWEQNEQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPTVMDFRKFSRNYQLYKSVSLPSLDPASAKIEGNLIFDPNNYLPKESMLKTTLTAFGFASADLIEIGLEGKGFEPTLEALFGKQGFFPDSVNKALYWVNGQVPDGVSKVLVDHFGYTKDDKHEQDMVNGIMLSVEKLIKDLKSKEVPEARAYLRILGEELGFASLHDLQLLGKLLLMGARTLQGIPQMIGEVIRKGSKNDFFLHYIFMENAFELPTGAGLQLQISSSGVIAPGAKAGVKLEVANMQAELVAKPSVSVEFVTNMGIIIPDFARSGVQMNTNFFHESGLEAHVALKAGKLKFIIPSPKRPVKLLSGGNTLHLVSTTKTEVIPPLIENRQSWSVCKQVFPGLNYCTSGAYSNASSTDSASYYPLTGDTRLELELRPTGEIEQYSVSATYELQREDRALVDTLKFVTQAEGAKQTEATMTFKYNRQSMTLSSEVQIPDFDVDLGTILRVNDESTEGKTSYRLTLDIQNKKITEVALMGHLSCDTKEERKIKGVISIPRLQAEARSEILAHWSPAKLLLQMDSSATAYGSTVSKRVAWHYDEEKIEFEWNTGTNVDTKKMTSNFPVDLSDYPKSLHMYANRLLDHRVPQTDMTFRHVGSKLIVAMSSWLQKASGSLPYTQTLQDHLNSLKEFNLQNMGLPDFHIPENLFLKSDGRVKYTLNKNSLKIEIPLPFGGKSSRDLKMLETVRTPALHFKSVGFHLPSREFQVPTFTIPKLYQLQVPLLGVLDLSTNVYSNLYNWSASYSGGNTSTDHFSLRARYHMKADSVVDLLSYNVQGSGETTYDHKNTFTLSCDGSLRHKFLDSNIKFSHVEKLGNNPVSKGLLIFDASSSWGPQMSASVHLDSKKKQHLFVKEVKIDGQFRVSSFYAKGTYGLSCQRDPNTGRLNGESNLRFNSSYLQGTNQITGRYEDGTLSLTSTSDLQSGIIKNTASLKYENYELTLKSDTNGKYKNFATSNKMDMTFSKQNALLRSEYQADYESLRFFSLLSGSLNSHGLELNADILGTDKINSGAHKATLRIGQDGISTSATTNLKCSLLVLENELNAELGLSGASMKLTTNGRFREHNAKFSLDGKAALTELSLGSAYQAMILGVDSKNIFNFKVSQEGLKLSNDMMGSYAEMKFDHTNSLNIAGLSLDFSSKLDNIYSSDKFYKQTVNLQLQPYSLVTTLNSDLKYNALDLTNNGKLRLEPLKLHVAGNLKGAYQNNEIKHIYAISSAALSASYKADTVAKVQGVEFSHRLNTDIAGLASAIDMSTNYNSDSLHFSNVFRSVMAPFTMTIDAHTNGNGKLALWGEHTGQLYSKFLLKAEPLAFTFSHDYKGSTSHHLVSRKSISAALEHKVSALLTPAEQTGTWKLKTQFNNNEYSQDLDAYNTKDKIGVELTGRTLADLTLLDSPIKVPLLLSEPINIIDALEMRDAVEKPQEFTIVAFVKYDKNQDVHSINLPFFETLQEYFERNRQTIIVVLENVQRNLKHINIDQFVRKYRAALGKLPQQANDYLNSFNWERQVSHAKEKLTALTKKYRITENDIQIALDDAKINFNEKLSQLQTYMIQFDQYIKDSYDLHDLKIAIANIIDEIIEKLKSLDEHYHIRVNLVKTIHDLHLFIENIDFNKSGSSTASWIQNVDTKYQIRIQIQEKLQQLKRHIQNIDIQHLAGKLKQHIEAIDVRVLLDQLGTTISFERINDILEHVKHFVINLIGDFEVAEKINAFRAKVHELIERYEVDQQIQVLMDKLVELAHQYKLKETIQKLSNVLQQVKIKDYFEKLVGFIDDAVKKLNELSFKTFIEDVNKFLDMLIKKLKSFDYHQFVDETNDKIREVTQRLNGEIQALELPQKAEALKLFLEETKATVAVYLESLQDTKITLIINWLQEALSSASLAHMKAKFRETLEDTRDRMYQMDIQQELQRYLSLVGQVYSTLVTYISDWWTLAAKNLTDFAEQYSIQDWAKRMKALVEQGFTVPEIKTILGTMPAFEVSLQALQKATFQTPDFIVPLTDLRIPSVQINFKDLKNIKIPSRFSTPEFTILNTFHIPSFTIDFVEMKVKIIRTIDQMLNSELQWPVPDIYLRDLKVEDIPLARITLPDFRLPEIAIPEFIIPTLNLNDFQVPDLHIPEFQLPHISHTIEVPTFGKLYSILKIQSPLFTLDANADIGNGTTSANEAGIAASITAKGESKLEVLNFDFQANAQLSNPKINPLALKESVKFSSKYLRTEHGSEMLFFGNAIEGKSNTVASLHTEKNTLELSNGVIVKINNQLTLDSNTKYFHKLNIPKLDFSSQADLRNEIKTLLKAGHIAWTSSGKGSWKWACPRFSDEGTHESQISFTIEGPLTSFGLSNKINSKHLRVNQNLVYESGSLNFSKLEIQSQVDSQHVGHSVLTAKGMALFGEGKAEFTGRHDAHLNGKVIGTLKNSLFFSAQPFEITASTNNEGNLKVRFPLRLTGKIDFLNNYALFLSPSAQQASWQVSARFNQYKYNQNFSAGNNENIMEAHVGINGEANLDFLNIPLTIPEMRLPYTIITTPPLKDFSLWEKTGLKEFLKTTKQSFDLSVKAQYKKNKHRHSITNPLAVLCEFISQSIKSFDRHFEKNRNNALDFVTKSYNETKIKFDKYKAEKSHDELPRTFQIPGYTVPVVNVEVSPFTIEMSAFGYVFPKAVSMPSFSILGSDVRVPSYTLILPSLELPVLHVPRNLKLSLPDFKELCTISHIFIPAMGNITYDFSFKSSVITLNTNAELFNQSDIVAHLLSSSSSVIDALQYKLEGTTRLTRKRGLKLATALSLSNKFVEGSHNSTVSLTTKNMEVSVATTTKAQIPILRMNFKQELNGNTKSKPTVSSSMEFKYDFNSSMLYSTAKGAVDHKLSLESLTSYFSIESSTKGDVKGSVLSREYSGTIASEANTYLNSKSTRSSVKLQGTSKIDDIWNLEVKENFAGEATLQRIYSLWEHSTKNHLQLEGLFFTNGEHTSKATLELSPWQMSALVQVHASQPSSFHDFPDLGQEVALNANTKNQKIRWKNEVRIHSGSFQSQVELSNDQEKAHLDIAGSLEGHLRFLKNIILPVYDKSLWDFLKLDVTTSIGRRQHLRVSTAFVYTKNPNGYSFSIPVKVLADKFIIPGLKLNDLNSVLVMPTFHVPFTDLQVPSCKLDFREIQIYKKLRTSSFALNLPTLPEVKFPEVDVLTKYSQPEDSLIPFFEITVPESQLTVSQFTLPKSVSDGIAALDLNAVANKIADFELPTIIVPEQTIEIPSIKFSVPAGIVIPSFQALTARFEVDSPVYNATWSASLKNKADYVETVLDSTCSSTVQFLEYELNVLGTHKIEDGTLASKTKGTFAHRDFSAEYEEDGKYEGLQEWEGKAHLNIKSPAFTDLHLRYQKDKKGISTSAASPAVGTVGMDMDEDDDFSKWNFYYSPQSSPDKKLTIFKTELRVRESDEETQIKVNWEEEAASGLLTSLKDNVPKATGVLYDYVNKYHWEHTGLTLREVSSKLRRNLQNNAEWVYQGAIRQIDDIDVRFQKAASGTTGTYQEWKDKAQNLYQELLTQEGQASFQGLKDNVFDGLVRVTQEFHMKVKHLIDSLIDFLNFPRFQFPGKPGIYTREELCTMFIREVGTVLSQVYSKVHNGSEILFSYFQDLVITLPFELRKHKLIDVISMYRELLKDLSKEAQEVFKAIQSLKTTEVLRNLQDLLQFIFQLIEDNIKQLKEMKFTYLINYIQDEINTIFSDYIPYVFKLLKENLCLNLHKFNEFIQNELQEASQELQQIHQYIMALREEYFDPSIVGWTVKYYELEEKIVSLIKNLLVALKDFHSEYIVSASNFTSQLSSQVEQFLHRNIQEYLSILTDPDGKGKEKIAELSATAQEIIKSQAIATKKIISDYHQQFRYKLQDFSDQLSDYYEKFIAESKRLIDLSIQNYHTFLIYITELLKKLQSTTVMNPYMKLAPGELTIIL'
+
+# apoB100 domain map (inclusive residue ranges); where ranges share a boundary residue the first domain listed wins
+APOB100_DOMAIN_RANGES = {
+    'NTD': [(1, 1011)],
+    'beta-belt': [(1011, 1186), (1276, 1289), (1355, 2016), (2050, 2062), (2757, 3123), (3166, 3179), (3336, 3668), (3700, 3713), (3880, 4058), (4551, 4564)],
+    'insert 1': [(1186, 1276)],
+    'insert 2': [(1289, 1355)],
+    'insert 3': [(2016, 2050)],
+    'insert 4': [(2062, 2757)],
+    'insert 5': [(3123, 3166)],
+    'insert 6': [(3179, 3336)],
+    'insert 7': [(3668, 3700)],
+    'insert 8': [(3713, 3880)],
+    'insert 9': [(4058, 4551)]
+}
+
+#######################################################################################
+def _normalize_column_names(df):
+    """
+    Normalizes column names at ingest: strips whitespace and stray byte order marks, and collapses
+    model suffixes such as 'CA Distance mod 2' to 'CA Distance mod2'.
+    """
+    df.columns = [re.sub(r'\bmod\s+(\d+)$', r'mod\1', str(column).lstrip('\ufeff').strip()) for column in df.columns]
+    return df
+
+#######################################################################################
+def _file_sha256(file_path, chunk_size=1 << 20):
+    """
+    Returns the SHA-256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+#######################################################################################
+def _cache_entry_dir(csv_file_path, cache_dir):
+    """
+    Returns the cache directory used for a source CSV file, unique per absolute source path.
+    """
+    source_path = os.path.abspath(csv_file_path)
+    path_hash = hashlib.sha256(source_path.encode('utf-8')).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{path_hash}")
+
+#######################################################################################
+def _write_column_cache(df, entry_dir, source_metadata):
+    """
+    Writes a DataFrame as one typed .npy file per column plus a metadata.json file and returns the metadata.
+    Numeric and boolean columns are stored as-is; every other column is stored as integer category codes with
+    a separate categories array.
+    """
+    if os.path.isdir(entry_dir):
+        shutil.rmtree(entry_dir)
+    os.makedirs(entry_dir)
+
+    columns = []
+    for position, name in enumerate(df.columns):
+        column = df[name]
+        file_name = f"column{position}.npy"
+        if column.dtype.kind in 'iufb':
+            np.save(os.path.join(entry_dir, file_name), column.to_numpy())
+            columns.append({'name': name, 'file': file_name, 'kind': 'numeric'})
+        else:
+            codes, categories = pd.factorize(column)
+            np.save(os.path.join(entry_dir, file_name), codes.astype(np.int32))
+            np.save(os.path.join(entry_dir, f"column{position}.categories.npy"), np.asarray(categories, dtype=str))
+            columns.append({'name': name, 'file': file_name, 'kind': 'categorical'})
+
+    # The metadata file is written last, so an entry without it is treated as incomplete
+    metadata = dict(source_metadata, n_rows=len(df), columns=columns)
+    with open(os.path.join(entry_dir, 'metadata.json'), 'w') as handle:
+        json.dump(metadata, handle)
+
+    return metadata
+
 #######################################################################################
-def read_csv_with_header(csv_file_path):
+def _read_column_cache(entry_dir, metadata, mmap_mode):
+    """
+    Rebuilds a DataFrame from a column cache written by _write_column_cache, memory-mapping the column arrays.
+    """
+    data = {}
+    for column in metadata['columns']:
+        values = np.load(os.path.join(entry_dir, column['file']), mmap_mode=mmap_mode)
+        if column['kind'] == 'categorical':
+            categories = np.load(os.path.join(entry_dir, column['file'].replace('.npy', '.categories.npy')))
+            values = pd.Categorical.from_codes(values, categories=categories)
+        data[column['name']] = values
+
+    return pd.DataFrame(data, copy=False)
+
+#######################################################################################
+def read_csv_with_header(csv_file_path, cache_dir=None, mmap_mode='c'):
     """
     Reads a CSV file into a DataFrame using the first row of the CSV as column headers.
 
+    Column names are normalized once at ingest (byte order mark removed, 'CA Distance mod 2' -> 'CA Distance mod2').
+    If cache_dir is given, the parsed table is also stored there as typed per-column NumPy arrays and later
+    calls reload it from the cache while the source file is unchanged (same size and modification time,
+    or same SHA-256 content hash).
+
     Args:
         csv_file_path (str): The path to the CSV file.
+        cache_dir (str, optional): Directory for the columnar cache. If None, the CSV is always parsed.
+        mmap_mode (str, optional): Memory-map mode used when loading cached columns ('c' maps them without
+                                   copying and keeps edits in memory without touching the cache, 'r' maps
+                                   them read-only; None loads them into memory).
 
     Returns:
         pd.DataFrame: A DataFrame with the data from the CSV file, using the first row as column names.
+                      Non-numeric columns are categorical when the table comes from the cache.
     """
-    # Read the CSV file, assuming the first row includes the column names
-    df = pd.read_csv(csv_file_path)
+    if cache_dir is None:
+        # Read the CSV file, assuming the first row includes the column names
+        return _normalize_column_names(pd.read_csv(csv_file_path, encoding='utf-8-sig'))
 
-    return df
+    entry_dir = _cache_entry_dir(csv_file_path, cache_dir)
+    metadata_path = os.path.join(entry_dir, 'metadata.json')
+    stat = os.stat(csv_file_path)
+    source_metadata = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    if os.path.isfile(metadata_path):
+        with open(metadata_path) as handle:
+            metadata = json.load(handle)
+
+        # Fast path on size and mtime; fall back to the content hash if the file was only touched
+        if all(metadata.get(key) == value for key, value in source_metadata.items()):
+            return _read_column_cache(entry_dir, metadata, mmap_mode)
+        if metadata.get('size') == stat.st_size and metadata.get('sha256') == _file_sha256(csv_file_path):
+            metadata.update(source_metadata)
+            with open(metadata_path, 'w') as handle:
+                json.dump(metadata, handle)
+            return _read_column_cache(entry_dir, metadata, mmap_mode)
+
+    df = _normalize_column_names(pd.read_csv(csv_file_path, encoding='utf-8-sig'))
+    metadata = _write_column_cache(df, entry_dir, dict(source_metadata, sha256=_file_sha256(csv_file_path)))
+
+    return _read_column_cache(entry_dir, metadata, mmap_mode)
+
+#######################################################################################
+def read_csm_stream(csv_file_path, residue1_column='Residue1', residue2_column='Residue2', score_column=None,
+                    min_score=None, fdr_column=None, max_fdr=None, chunksize=1_000_000, **read_csv_kwargs):
+    """
+    Streams a crosslink-spectrum match (CSM) export, one row per spectrum, and collapses it into one row per
+    crosslinked residue pair with its spectral count. Only the needed columns are read, chunk by chunk, and
+    the counts are aggregated per canonical pair as each chunk arrives, so the full spectrum table is never
+    held in memory.
+
+    Args:
+        csv_file_path (str): The path to the CSM file (anything pd.read_csv accepts, e.g. a .csv.gz).
+        residue1_column (str): Column holding the first crosslinked residue number.
+        residue2_column (str): Column holding the second crosslinked residue number.
+        score_column (str, optional): Score column used with min_score.
+        min_score (float, optional): Keep spectra with score >= min_score.
+        fdr_column (str, optional): FDR / q-value column used with max_fdr.
+        max_fdr (float, optional): Keep spectra with FDR <= max_fdr.
+        chunksize (int): Number of spectra read per chunk.
+        **read_csv_kwargs: Passed on to pd.read_csv (e.g. sep='\t').
+
+    Returns:
+        pd.DataFrame: One row per unique crosslink with 'Residue1' (lower residue), 'Residue2', 'Spectral Count'
+                      and 'Sequence Distance' columns, sorted by residue pair. CA distances and domains can be
+                      added with xlink_structure_functions.add_ca_distances and annotate_domains.
+    """
+    filters = [(score_column, min_score, 'score'), (fdr_column, max_fdr, 'FDR')]
+    for column, cutoff, name in filters:
+        if (column is None) != (cutoff is None):
+            raise ValueError(f"The {name} column and cutoff must be given together.")
+    usecols = [residue1_column, residue2_column] + [column for column, _, _ in filters if column is not None]
+
+    spectral_counts = pd.Series(dtype=np.int64)
+    reader = pd.read_csv(csv_file_path, usecols=usecols, chunksize=chunksize, encoding='utf-8-sig', **read_csv_kwargs)
+    for chunk in reader:
+        keep = chunk[residue1_column].notna().to_numpy() & chunk[residue2_column].notna().to_numpy()
+        if score_column is not None:
+            keep &= (chunk[score_column] >= min_score).to_numpy()
+        if fdr_column is not None:
+            keep &= (chunk[fdr_column] <= max_fdr).to_numpy()
+        chunk = chunk[keep]
+
+        # Count spectra per packed canonical pair key and fold the chunk into the running totals
+        keys = canonical_pair_keys(chunk.rename(columns={residue1_column: 'Residue1', residue2_column: 'Residue2'}))
+        chunk_counts = pd.Series(keys).value_counts()
+        spectral_counts = spectral_counts.add(chunk_counts, fill_value=0).astype(np.int64)
+
+    spectral_counts = spectral_counts.sort_index()
+    low, high = unpack_canonical_pair_keys(spectral_counts.index.to_numpy())
+    xlinks_df = pd.DataFrame({
+        'Residue1': low,
+        'Residue2': high,
+        'Spectral Count': spectral_counts.to_numpy(),
+        'Sequence Distance': high - low
+    })
+
+    return xlinks_df
+
+#######################################################################################
+class FilterCache:
+    """
+    Opt-in LRU cache for the filter and summary functions. Entries are keyed by a fingerprint of the columns
+    a call reads plus its arguments. Filters store boolean row masks instead of filtered copies, and the cache
+    evicts least recently used entries once their total size exceeds max_bytes. Enable it with
+    enable_filter_cache.
+
+    The default fingerprint is cheap: the length, dtype and memory address of each column plus a hash of
+    sample_rows evenly spaced values, so a new or copied DataFrame never matches an older one, but an
+    in-place edit that misses every sampled row is not detected (call clear() after such edits). With
+    strict=True every value is hashed on every call instead, which detects any edit but costs about as
+    much as the filter itself.
+    """
+
+    def __init__(self, max_bytes=256 << 20, strict=False, sample_rows=1024):
+        self.max_bytes = max_bytes
+        self.strict = strict
+        self.sample_rows = sample_rows
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def fingerprint(self, df, columns):
+        """
+        Hashes the length of df and the given columns (those present in df): every value if strict,
+        otherwise each column's memory address and a sample of its values.
+        """
+        digest = hashlib.sha1(repr((len(df), list(columns))).encode())
+        sample = None
+        if not self.strict:
+            sample = np.unique(np.linspace(0, max(len(df) - 1, 0), min(len(df), self.sample_rows)).astype(np.int64))
+
+        for column in columns:
+            if column not in df.columns:
+                continue
+            series = df[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                digest.update(pd.util.hash_array(series.cat.categories.to_numpy()).data)
+                values = series.array.codes
+            else:
+                values = series.to_numpy()
+            digest.update(str(values.dtype).encode())
+
+            # Only views of the DataFrame's own memory have a stable address; arrays converted on the fly
+            # are temporary (their address can be reused), so those columns are hashed in full
+            if sample is not None and not values.flags.owndata:
+                digest.update(repr((values.__array_interface__['data'][0], values.strides)).encode())
+                values = values[sample]
+            if values.dtype == object:
+                values = pd.util.hash_array(values)
+            digest.update(np.ascontiguousarray(values).data)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached value for key (marking it most recently used) or None, counting hits and misses.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, nbytes):
+        """
+        Stores a value of the given size, evicting least recently used entries to stay within max_bytes.
+        Values larger than max_bytes are not stored.
+        """
+        if nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        """
+        Drops every entry and resets the counters.
+        """
+        self._entries.clear()
+        self.nbytes = self.hits = self.misses = 0
+
+    def info(self):
+        """
+        Returns the hit/miss counters and the current size of the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                'nbytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+# The active FilterCache, or None while caching is disabled
+_FILTER_CACHE = None
+
+#######################################################################################
+def enable_filter_cache(max_bytes=256 << 20, strict=False):
+    """
+    Turns on memoization of XlinkQuery masks (and so of filter_by_spectral_count, filter_by_domain,
+    filter_by_ca_distance and filter_by_residue) and of domain_crosslink_stats. While enabled the filters
+    may return df itself (every row kept) or a slice view of it (a contiguous block of rows kept), so results
+    should not be modified in place. Only the boolean masks are cached and they are applied to the current
+    df on every call; XlinkQuery(df)...mask() returns the cached (read-only) mask without selecting rows.
+
+    Args:
+        max_bytes (int): Upper bound on the memory held by cached masks and tables.
+        strict (bool): Fingerprint DataFrames by hashing every value instead of a sample (see FilterCache).
+
+    Returns:
+        FilterCache: The new active cache.
+    """
+    global _FILTER_CACHE
+    _FILTER_CACHE = FilterCache(max_bytes, strict=strict)
+    return _FILTER_CACHE
+
+#######################################################################################
+def disable_filter_cache():
+    """
+    Turns off memoization and drops the active cache.
+    """
+    global _FILTER_CACHE
+    _FILTER_CACHE = None
+
+#######################################################################################
+def filter_cache_info():
+    """
+    Returns the hit/miss counters and size of the active cache, or None while caching is disabled.
+    """
+    return None if _FILTER_CACHE is None else _FILTER_CACHE.info()
+
+#######################################################################################
+def _cached_call(name, df, columns, args, compute, nbytes):
+    """
+    Returns compute() through the active cache, keyed by the function name, the fingerprint of the columns it
+    reads and its arguments. nbytes(value) gives the size charged against the cache.
+    """
+    if _FILTER_CACHE is None:
+        return compute()
+
+    key = (name, _FILTER_CACHE.fingerprint(df, columns), args)
+    value = _FILTER_CACHE.get(key)
+    if value is None:
+        value = compute()
+        _FILTER_CACHE.put(key, value, nbytes(value))
+    return value
+
+#######################################################################################
+def _apply_row_mask(df, mask):
+    """
+    Selects the rows of df in a boolean mask, avoiding a copy when the mask keeps every row (df itself) or
+    one contiguous block of rows (a positional slice).
+    """
+    n_kept = np.count_nonzero(mask)
+    if n_kept == len(df):
+        return df
+    if n_kept:
+        first = int(mask.argmax())
+        last = len(mask) - int(mask[::-1].argmax())
+        if last - first == n_kept:
+            return df.iloc[first:last]
+    return df[mask]
 
 #######################################################################################    
 def filter_by_spectral_count(df, spectral_count_threshold):
@@ -39,121 +400,775 @@ def filter_by_spectral_count(df, spectral_count_threshold):
     Returns:
         pd.DataFrame: A new filtered DataFrame with rows where 'Spectral Count' is greater than or equal to the threshold.
     """
-    if 'Spectral Count' not in df.columns:
-        raise ValueError("DataFrame must include a 'Spectral Count' column.")
-
-    # Filter the DataFrame
-    filtered_df = df[df['Spectral Count'] >= spectral_count_threshold]
+    filtered_df = XlinkQuery(df).spectral(spectral_count_threshold).collect()
     return filtered_df
 
 #######################################################################################
-def domain_crosslink_stats(df, sequence):
+def canonical_pair_keys(df):
+    """
+    Builds an order-independent key for every crosslink, packing the lower residue number into the high
+    32 bits and the higher residue number into the low 32 bits of a single int64.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'Residue1' and 'Residue2' columns holding non-negative residue numbers.
+
+    Returns:
+        np.ndarray: int64 array with one key per row; A-B and B-A crosslinks share the same key.
+    """
+    if 'Residue1' not in df.columns or 'Residue2' not in df.columns:
+        raise ValueError("DataFrame must include 'Residue1' and 'Residue2' columns.")
+
+    residue1 = df['Residue1'].to_numpy(dtype=np.int64)
+    residue2 = df['Residue2'].to_numpy(dtype=np.int64)
+    return (np.minimum(residue1, residue2) << 32) | np.maximum(residue1, residue2)
+
+#######################################################################################
+def unpack_canonical_pair_keys(keys):
+    """
+    Splits keys produced by canonical_pair_keys back into residue numbers.
+
+    Args:
+        keys (np.ndarray): int64 canonical pair keys.
+
+    Returns:
+        tuple: Two np.ndarray objects (low, high) with the lower and higher residue number of each pair.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> 32, keys & 0xFFFFFFFF
+
+#######################################################################################
+def _build_interval_index(ranges):
+    """
+    Builds a sorted, non-overlapping interval index from a list of inclusive residue ranges.
+
+    Args:
+        ranges (list): List of (start, end) tuples, both ends inclusive.
+
+    Returns:
+        tuple: Two np.ndarray objects (starts, ends) sorted by start, with overlapping or touching ranges merged.
+    """
+    bounds = np.array(sorted(ranges), dtype=np.int64).reshape(-1, 2)
+    if len(bounds) == 0:
+        return bounds[:, 0], bounds[:, 1]
+
+    # Merge ranges that overlap or touch so every residue falls in at most one interval
+    running_end = np.maximum.accumulate(bounds[:, 1])
+    new_interval = np.ones(len(bounds), dtype=bool)
+    new_interval[1:] = bounds[1:, 0] > running_end[:-1] + 1
+
+    starts = bounds[new_interval, 0]
+    ends = np.maximum.reduceat(bounds[:, 1], np.flatnonzero(new_interval))
+    return starts, ends
+
+#######################################################################################
+def _in_intervals(values, starts, ends):
+    """
+    Tests which values fall inside a sorted interval index using a binary search.
+
+    Args:
+        values (np.ndarray): Residue numbers to test.
+        starts (np.ndarray): Sorted interval start positions.
+        ends (np.ndarray): Interval end positions matching starts.
+
+    Returns:
+        np.ndarray: Boolean array, True where the value lies within one of the intervals.
+    """
+    values = np.asarray(values)
+    if len(starts) == 0:
+        return np.zeros(values.shape, dtype=bool)
+
+    # Index of the last interval starting at or before each value
+    idx = np.searchsorted(starts, values, side='right') - 1
+    return (idx >= 0) & (values <= ends[np.clip(idx, 0, None)])
+
+#######################################################################################
+class ProteinAnnotation:
+    """
+    Sequence-level arrays shared by every crosslink statistic on one protein and domain map, all indexed by
+    residue number (1-based): a lysine mask and its prefix sums, the domain membership pattern of each residue,
+    per-domain residue and lysine counts, and the residue -> domain code array that annotate_domains and the
+    domain filters look codes up in. Build one per protein with get_protein_annotation, save it with save() and
+    reload it by name with ProteinAnnotation.load().
+
+    Attributes:
+        name (str): Name the annotation is saved and loaded under.
+        sequence (str): Protein sequence.
+        domain_names (list): Domain names; domain code i refers to domain_names[i].
+        domain_ranges (dict): Mapping of domain name to inclusive (start, end) residue ranges.
+        is_lysine (np.ndarray): Boolean lysine mask.
+        lysine_prefix (np.ndarray): lysine_prefix[i] is the number of lysines before residue i.
+        residue_domains (np.ndarray): Read-only domain code of each residue number up to the end of the domain
+                                      map, the first domain listed winning on shared boundary residues (-1
+                                      outside every domain). It is the lookup shared by every function given
+                                      the same domain map (see _domain_lookup).
+        membership_patterns (np.ndarray): Boolean (n_patterns, n_domains) array of the distinct combinations of
+                                          domains a residue can belong to (boundary residues belong to two).
+        residue_patterns (np.ndarray): Row of membership_patterns for each residue number, with one extra entry
+                                       past the end for residues outside the annotation (in no domain).
+        domain_residue_counts (np.ndarray): Number of residues in each domain.
+        domain_lysine_counts (np.ndarray): Number of lysines in each domain.
+    """
+
+    _ARRAYS = ['is_lysine', 'lysine_prefix', 'residue_domains', 'membership_patterns', 'residue_patterns',
+               'interval_starts',
+               'interval_ends', 'interval_domains', 'domain_residue_counts', 'domain_lysine_counts']
+
+    def __init__(self, sequence, domain_ranges=None, name=None):
+        if domain_ranges is None:
+            domain_ranges = APOB100_DOMAIN_RANGES
+        self.name = name
+        self.sequence = sequence
+        self.domain_ranges = {domain: [tuple(map(int, bounds)) for bounds in ranges]
+                              for domain, ranges in domain_ranges.items()}
+        self.domain_names = list(self.domain_ranges)
+
+        # Arrays cover residue numbers 0 .. the end of the sequence or of the domain map, whichever is later
+        max_end = max((end for ranges in self.domain_ranges.values() for _, end in ranges), default=0)
+        n_residues = max(len(sequence), max_end) + 1
+
+        self.is_lysine = np.zeros(n_residues, dtype=bool)
+        self.is_lysine[1:len(sequence) + 1] = np.frombuffer(sequence.encode('ascii'), dtype=np.uint8) == ord('K')
+        self.lysine_prefix = np.concatenate([[0], np.cumsum(self.is_lysine)])
+
+        self.residue_domains, _ = _domain_lookup(self.domain_ranges)
+
+        # Merged intervals of every domain, flattened with the code of the domain each belongs to
+        intervals = [_build_interval_index(self.domain_ranges[domain]) for domain in self.domain_names]
+        self.interval_starts = np.concatenate([starts for starts, _ in intervals] + [np.zeros(0, dtype=np.int64)])
+        self.interval_ends = np.concatenate([ends for _, ends in intervals] + [np.zeros(0, dtype=np.int64)])
+        self.interval_domains = np.repeat(np.arange(len(intervals)), [len(starts) for starts, _ in intervals])
+
+        # Membership of every residue in every domain (plus an out-of-range slot in none), stored as the few
+        # distinct membership patterns and the pattern of each residue
+        residue_numbers = np.arange(n_residues + 1)
+        membership = np.zeros((n_residues + 1, len(self.domain_names)), dtype=bool)
+        for code, (starts, ends) in enumerate(intervals):
+            membership[:, code] = _in_intervals(residue_numbers, starts, ends)
+        membership[-1] = False
+        self.membership_patterns, residue_patterns = np.unique(membership, axis=0, return_inverse=True)
+        self.residue_patterns = residue_patterns.reshape(-1).astype(np.int64)
+
+        self.domain_residue_counts = membership.sum(axis=0)
+        self.domain_lysine_counts = self._interval_sums(self.lysine_prefix)
+
+    def __repr__(self):
+        return f"ProteinAnnotation(name={self.name!r}, {len(self.sequence)} residues, {len(self.domain_names)} domains)"
+
+    @property
+    def n_residues(self):
+        return len(self.is_lysine)
+
+    @property
+    def lysine_residues(self):
+        """
+        Residue numbers of the lysines.
+        """
+        return np.flatnonzero(self.is_lysine)
+
+    def lysine_count(self, start, end):
+        """
+        Number of lysines in the inclusive residue range start..end, from the prefix sums.
+        """
+        start = min(max(start, 0), self.n_residues)
+        end = min(max(end + 1, start), self.n_residues)
+        return int(self.lysine_prefix[end] - self.lysine_prefix[start])
+
+    def _interval_sums(self, prefix):
+        """
+        Sums a per-residue quantity, given as prefix sums, over the intervals of each domain.
+        """
+        ends = np.minimum(self.interval_ends + 1, len(prefix) - 1)
+        starts = np.minimum(self.interval_starts, ends)
+        return np.bincount(self.interval_domains, weights=prefix[ends] - prefix[starts],
+                           minlength=len(self.domain_names)).astype(np.int64)
+
+    def clip_residues(self, residues):
+        """
+        Maps residue numbers outside the annotation to the extra out-of-range entry of residue_patterns.
+        """
+        residues = np.asarray(residues, dtype=np.int64)
+        return np.where((residues >= 0) & (residues < self.n_residues), residues, self.n_residues)
+
+    def save(self, directory='.protein_annotations'):
+        """
+        Writes the annotation to <directory>/<name>.npz.
+
+        Returns:
+            str: Path of the written file.
+        """
+        if not self.name:
+            raise ValueError("The annotation needs a name to be saved.")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}.npz")
+
+        metadata = {'name': self.name, 'sequence': self.sequence, 'domain_ranges': self.domain_ranges}
+        np.savez(path, metadata=np.array(json.dumps(metadata)),
+                 **{attribute: getattr(self, attribute) for attribute in self._ARRAYS})
+        return path
+
+    @classmethod
+    def load(cls, name, directory='.protein_annotations'):
+        """
+        Loads an annotation saved under a name (or from an .npz path). The built-in names ('apob100') are
+        built from the constants of this module when no saved file exists.
+
+        Returns:
+            ProteinAnnotation: The loaded annotation.
+        """
+        path = name if name.endswith('.npz') else os.path.join(directory, f"{name}.npz")
+        if not os.path.exists(path):
+            if name in _BUILTIN_PROTEINS:
+                sequence, domain_ranges = _BUILTIN_PROTEINS[name]
+                return get_protein_annotation(sequence, domain_ranges, name=name)
+            raise FileNotFoundError(f"No saved protein annotation at {path}.")
+
+        with np.load(path, allow_pickle=False) as saved:
+            metadata = json.loads(str(saved['metadata']))
+            annotation = cls.__new__(cls)
+            annotation.name = metadata['name']
+            annotation.sequence = metadata['sequence']
+            annotation.domain_ranges = {domain: [tuple(bounds) for bounds in ranges]
+                                        for domain, ranges in metadata['domain_ranges'].items()}
+            annotation.domain_names = list(annotation.domain_ranges)
+            for attribute in cls._ARRAYS:
+                setattr(annotation, attribute, saved[attribute])
+        annotation.residue_domains.flags.writeable = False
+        _DOMAIN_LOOKUPS.setdefault(_domain_ranges_key(annotation.domain_ranges),
+                                   (annotation.residue_domains, annotation.domain_names))
+        return annotation
+
+# Proteins that ProteinAnnotation.load can build by name
+_BUILTIN_PROTEINS = {'apob100': (APOB100_SEQUENCE, APOB100_DOMAIN_RANGES)}
+
+# Annotations built by get_protein_annotation, keyed by sequence and domain map
+_PROTEIN_ANNOTATIONS = {}
+
+#######################################################################################
+def get_protein_annotation(sequence, domain_ranges=None, name=None):
+    """
+    Returns the ProteinAnnotation of a sequence and domain map, building it on the first request only.
+
+    Args:
+        sequence (str): Protein sequence.
+        domain_ranges (dict, optional): Mapping of domain name to a list of inclusive (start, end) residue ranges.
+                                        Defaults to APOB100_DOMAIN_RANGES.
+        name (str, optional): Name for saving; also names an annotation that was first built without one.
+
+    Returns:
+        ProteinAnnotation: The shared annotation.
+    """
+    if domain_ranges is None:
+        domain_ranges = APOB100_DOMAIN_RANGES
+    key = (sequence, _domain_ranges_key(domain_ranges))
+
+    annotation = _PROTEIN_ANNOTATIONS.get(key)
+    if annotation is None:
+        annotation = _PROTEIN_ANNOTATIONS[key] = ProteinAnnotation(sequence, domain_ranges, name=name)
+    elif name is not None and annotation.name is None:
+        annotation.name = name
+    return annotation
+
+#######################################################################################
+def domain_crosslink_stats(df, sequence, domain_ranges=None):
     """
     Calculates statistics for predefined domains, including the total number of residues, total lysine residues,
     lysine residues participating in crosslinks, and total unique crosslinks based on a protein sequence.
 
     Args:
         df (pd.DataFrame): DataFrame containing residue pairs and possibly residue types.
-        sequence (str): A string representing the amino acid sequence of the protein.
+        sequence (str or ProteinAnnotation): A string representing the amino acid sequence of the protein, or a
+                                             prebuilt ProteinAnnotation (whose domain map is then used).
+        domain_ranges (dict, optional): Mapping of domain name to a list of inclusive (start, end) residue ranges.
+                                        Defaults to APOB100_DOMAIN_RANGES.
 
     Returns:
         pd.DataFrame: A new DataFrame with domain statistics.
     """
-    # Predefined domain ranges
-    domain_ranges = {
-        'NTD': [(1, 1011)],
-        'beta-belt': [(1011, 1186), (1276, 1289), (1355, 2016), (2050, 2062), (2757, 3123), (3166, 3179), (3336, 3668), (3700, 3713), (3880, 4058), (4551, 4564)],
-        'insert 1': [(1186, 1276)],
-        'insert 2': [(1289, 1355)],
-        'insert 3': [(2016, 2050)],
-        'insert 4': [(2062, 2757)],
-        'insert 5': [(3123, 3166)],
-        'insert 6': [(3179, 3336)],
-        'insert 7': [(3668, 3700)],
-        'insert 8': [(3713, 3880)],
-        'insert 9': [(4058, 4551)]
-    }
-
-    # Find lysine residues by their positions in the sequence
-    lysine_residues = {index + 1 for index, residue in enumerate(sequence) if residue == 'K'}
+    if isinstance(sequence, ProteinAnnotation):
+        annotation = sequence
+    else:
+        annotation = get_protein_annotation(sequence, domain_ranges)
 
-    output_df = pd.DataFrame(columns=['Domain', 'Total Residues', 'Total Lysine Residues',
-                                      'Lysine Residues in Crosslinks', 'Total Unique Crosslinks'])
+    if _FILTER_CACHE is not None:
+        stats_df = _cached_call('domain_crosslink_stats', df, ['Residue1', 'Residue2'],
+                                (annotation.sequence, _domain_ranges_key(annotation.domain_ranges)),
+                                lambda: _domain_crosslink_stats(df, annotation),
+                                lambda stats_df: int(stats_df.memory_usage(deep=True).sum()))
+        return stats_df.copy()
 
-    for domain, ranges in domain_ranges.items():
-        domain_residues = set()
-        for start, end in ranges:
-            domain_residues.update(range(start, end + 1))
+    return _domain_crosslink_stats(df, annotation)
 
-        lysines_in_domain = domain_residues.intersection(lysine_residues)
+#######################################################################################
+def _domain_crosslink_stats(df, annotation):
+    """
+    Computes the domain_crosslink_stats table without going through the cache.
+    """
+    # Canonical (low, high) residue pairs, deduplicated once for all domains with a hash on the packed key
+    low, high = unpack_canonical_pair_keys(pd.unique(canonical_pair_keys(df)))
+    low = annotation.clip_residues(low)
+    high = annotation.clip_residues(high)
 
-        domain_crosslinks = df[(df['Residue1'].isin(domain_residues)) | (df['Residue2'].isin(domain_residues))]
-        
-        unique_crosslinks = set()
-        for _, row in domain_crosslinks.iterrows():
-            pair = tuple(sorted([row['Residue1'], row['Residue2']]))
-            unique_crosslinks.add(pair)
+    # Crosslinked lysines as prefix sums, so each domain's count is a difference per interval
+    is_crosslinked = np.zeros(annotation.n_residues + 1, dtype=bool)
+    is_crosslinked[low] = True
+    is_crosslinked[high] = True
+    crosslinked_lysines = is_crosslinked[:-1] & annotation.is_lysine
+    crosslinked_prefix = np.concatenate([[0], np.cumsum(crosslinked_lysines)])
 
-        lysines_in_crosslinks = {res for pair in unique_crosslinks for res in pair if res in lysines_in_domain}
+    # A crosslink belongs to a domain if either end falls inside it: count crosslinks per pair of membership
+    # patterns, then credit each pattern pair to the union of its domains
+    patterns = annotation.membership_patterns
+    n_patterns = len(patterns)
+    pattern_pairs = np.bincount(annotation.residue_patterns[low] * n_patterns + annotation.residue_patterns[high],
+                                minlength=n_patterns * n_patterns).reshape(n_patterns, n_patterns)
+    domain_crosslinks = np.tensordot(pattern_pairs, patterns[:, None, :] | patterns[None, :, :], axes=([0, 1], [0, 1]))
 
-        output_df = output_df.append({
-            'Domain': domain,
-            'Total Residues': len(domain_residues),
-            'Total Lysine Residues': len(lysines_in_domain),
-            'Lysine Residues in Crosslinks': len(lysines_in_crosslinks),
-            'Total Unique Crosslinks': len(unique_crosslinks)
-        }, ignore_index=True)
+    output_df = pd.DataFrame({
+        'Domain': annotation.domain_names,
+        'Total Residues': annotation.domain_residue_counts.astype(int),
+        'Total Lysine Residues': annotation.domain_lysine_counts.astype(int),
+        'Lysine Residues in Crosslinks': annotation._interval_sums(crosslinked_prefix).astype(int),
+        'Total Unique Crosslinks': domain_crosslinks.astype(int)
+    }, columns=['Domain', 'Total Residues', 'Total Lysine Residues', 'Lysine Residues in Crosslinks',
+                'Total Unique Crosslinks'])
 
     return output_df
 
 #######################################################################################
-def summarize_by_domain_association(df):
+def _build_domain_lookup(domain_ranges):
+    """
+    Builds a residue-number -> domain code lookup array from a domain map.
+
+    Args:
+        domain_ranges (dict): Mapping of domain name to a list of inclusive (start, end) residue ranges.
+
+    Returns:
+        tuple: An np.ndarray of int16 domain codes indexed by residue number (-1 where no domain applies)
+               and the list of domain names, where code i refers to domain_names[i].
+    """
+    domain_names = list(domain_ranges)
+    max_end = max((end for ranges in domain_ranges.values() for _, end in ranges), default=0)
+    residue_numbers = np.arange(max_end + 1)
+
+    lookup = np.full(max_end + 1, -1, dtype=np.int16)
+    # Paint domains in reverse so that the first domain listed wins on shared boundary residues
+    for code in range(len(domain_names) - 1, -1, -1):
+        starts, ends = _build_interval_index(domain_ranges[domain_names[code]])
+        lookup[_in_intervals(residue_numbers, starts, ends)] = code
+
+    return lookup, domain_names
+
+# Residue -> domain code lookups built by _domain_lookup, keyed by domain map
+_DOMAIN_LOOKUPS = {}
+
+#######################################################################################
+def _domain_ranges_key(domain_ranges):
+    """
+    Returns a hashable key of a domain map.
+    """
+    return tuple((domain, tuple(tuple(map(int, bounds)) for bounds in ranges))
+                 for domain, ranges in domain_ranges.items())
+
+#######################################################################################
+def _domain_lookup(domain_ranges):
+    """
+    Returns the shared read-only lookup array and domain names of a domain map (see _build_domain_lookup),
+    building them on the first request only. ProteinAnnotation.residue_domains is the same array.
+    """
+    key = _domain_ranges_key(domain_ranges)
+    if key not in _DOMAIN_LOOKUPS:
+        lookup, domain_names = _build_domain_lookup(domain_ranges)
+        lookup.flags.writeable = False
+        _DOMAIN_LOOKUPS[key] = (lookup, domain_names)
+    return _DOMAIN_LOOKUPS[key]
+
+#######################################################################################
+def _lookup_domain_codes(residues, lookup):
+    """
+    Looks up domain codes for an array of residue numbers, returning -1 for residues outside the lookup.
+    """
+    residues = np.asarray(residues, dtype=np.int64)
+    valid = (residues >= 0) & (residues < len(lookup))
+    return np.where(valid, lookup[np.where(valid, residues, 0)], -1).astype(np.int16)
+
+#######################################################################################
+def _association_codes(domain1_codes, domain2_codes, n_domains):
+    """
+    Packs a pair of domain code arrays into one ordered association code, domain1 * n_domains + domain2
+    (-1 where either end has no domain).
+    """
+    return np.where((domain1_codes >= 0) & (domain2_codes >= 0),
+                    domain1_codes.astype(np.int32) * n_domains + domain2_codes, -1)
+
+#######################################################################################
+def _association_categorical(domain1_codes, domain2_codes, domain_names):
+    """
+    Builds a categorical "<domain1> to <domain2>" association column whose codes are the packed association codes.
+    """
+    categories = [f"{first} to {second}" for first in domain_names for second in domain_names]
+    return pd.Categorical.from_codes(_association_codes(domain1_codes, domain2_codes, len(domain_names)),
+                                     categories=categories)
+
+#######################################################################################
+def annotate_domains(df, domain_ranges=None):
+    """
+    Assigns domains to both ends of every crosslink from the residue numbers, so raw residue pair tables
+    do not need a pre-annotated "Domain Association" column.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'Residue1' and 'Residue2' columns.
+        domain_ranges (dict, optional): Mapping of domain name to a list of inclusive (start, end) residue ranges.
+                                        Defaults to APOB100_DOMAIN_RANGES.
+
+    Returns:
+        pd.DataFrame: A copy of the DataFrame with categorical 'Domain1' and 'Domain2' columns and a categorical
+                      'Domain Association' column ("<Domain1> to <Domain2>"). Residues outside every domain are NaN.
+    """
+    if 'Residue1' not in df.columns or 'Residue2' not in df.columns:
+        raise ValueError("DataFrame must include 'Residue1' and 'Residue2' columns.")
+
+    if domain_ranges is None:
+        domain_ranges = APOB100_DOMAIN_RANGES
+
+    lookup, domain_names = _domain_lookup(domain_ranges)
+    domain1_codes = _lookup_domain_codes(df['Residue1'].to_numpy(), lookup)
+    domain2_codes = _lookup_domain_codes(df['Residue2'].to_numpy(), lookup)
+
+    annotated_df = df.copy()
+    annotated_df['Domain1'] = pd.Categorical.from_codes(domain1_codes, categories=domain_names)
+    annotated_df['Domain2'] = pd.Categorical.from_codes(domain2_codes, categories=domain_names)
+    annotated_df['Domain Association'] = _association_categorical(domain1_codes, domain2_codes, domain_names)
+
+    return annotated_df
+
+#######################################################################################
+def _domain_association_codes(df, domain_ranges=None):
+    """
+    Returns integer domain codes for both ends of every crosslink in a DataFrame.
+
+    Uses categorical 'Domain1'/'Domain2' columns when present (see annotate_domains), otherwise parses the
+    distinct values of a pre-annotated 'Domain Association' column once, and falls back to annotating the
+    residue numbers with the domain map.
+
+    Returns:
+        tuple: Two np.ndarray objects of domain codes (-1 for missing) and the list of domain names.
+    """
+    if domain_ranges is None:
+        domain_ranges = APOB100_DOMAIN_RANGES
+
+    domain1, domain2 = df.get('Domain1'), df.get('Domain2')
+    if isinstance(getattr(domain1, 'dtype', None), pd.CategoricalDtype) \
+            and isinstance(getattr(domain2, 'dtype', None), pd.CategoricalDtype) \
+            and domain1.cat.categories.equals(domain2.cat.categories):
+        return domain1.cat.codes.to_numpy(), domain2.cat.codes.to_numpy(), list(domain1.cat.categories)
+
+    if 'Domain Association' in df.columns:
+        # Parse each distinct association string once, then gather the codes for every row
+        association_codes, associations = pd.factorize(df['Domain Association'])
+        domain_names = list(domain_ranges)
+        name_codes = {name: code for code, name in enumerate(domain_names)}
+
+        # Column 0/1 hold the codes of the first/second domain; the final row (-1) is for missing associations
+        unique_codes = np.full((len(associations) + 1, 2), -1, dtype=np.int16)
+        for i, association in enumerate(associations):
+            domains = [domain.strip() for domain in str(association).split(" to ")]
+            for end, domain in enumerate((domains[0], domains[-1])):
+                if domain not in name_codes:
+                    name_codes[domain] = len(domain_names)
+                    domain_names.append(domain)
+                unique_codes[i, end] = name_codes[domain]
+
+        return unique_codes[association_codes, 0], unique_codes[association_codes, 1], domain_names
+
+    if 'Residue1' in df.columns and 'Residue2' in df.columns:
+        lookup, domain_names = _domain_lookup(domain_ranges)
+        return (_lookup_domain_codes(df['Residue1'].to_numpy(), lookup),
+                _lookup_domain_codes(df['Residue2'].to_numpy(), lookup), list(domain_names))
+
+    raise ValueError("The DataFrame must include a 'Domain Association' column or 'Residue1' and 'Residue2' columns.")
+
+#######################################################################################
+def _domain_association_groups(df):
+    """
+    Assigns every row to a domain association group, with groups numbered in alphabetical order of
+    their "<domain1> to <domain2>" names (the order a groupby on the string column gives).
+
+    Returns:
+        tuple: An np.ndarray of group ids (-1 for rows without a domain association) and the list of group names.
+    """
+    domain1_codes, domain2_codes, domain_names = _domain_association_codes(df)
+    n_domains = len(domain_names)
+    association_codes = _association_codes(domain1_codes, domain2_codes, n_domains)
+
+    present = np.flatnonzero(np.bincount(association_codes[association_codes >= 0], minlength=n_domains ** 2))
+    names = [f"{domain_names[code // n_domains]} to {domain_names[code % n_domains]}" for code in present]
+    order = sorted(range(len(names)), key=names.__getitem__)
+
+    # The extra final slot maps association code -1 to group -1
+    group_lookup = np.full(n_domains ** 2 + 1, -1, dtype=np.int64)
+    group_lookup[present[order]] = np.arange(len(order))
+    return group_lookup[association_codes], [names[i] for i in order]
+
+#######################################################################################
+def _threshold_bins(values, cutoffs, at_most):
+    """
+    Bins values against a set of cutoffs so that cumulative bin counts give the number of values meeting each
+    cutoff: value <= cutoff when at_most is True, otherwise value >= cutoff. NaN values never meet a cutoff.
+
+    Returns:
+        tuple: Bin index per value (0..len(cutoffs)) and the argsort of the cutoffs.
     """
-    Prepares a DataFrame by adding a 'Canonical Pair' column that uniquely identifies crosslinks and then
-    summarizes it by the 'Domain Association' column, aggregating various statistics.
+    values = np.asarray(values, dtype=float)
+    cutoffs = np.asarray(cutoffs, dtype=float)
+    order = np.argsort(cutoffs, kind='stable')
+    if at_most:
+        # value <= cutoffs[order][j] exactly when bin <= j
+        bins = np.searchsorted(cutoffs[order], values, side='left')
+        bins[np.isnan(values)] = len(cutoffs)
+    else:
+        # value >= cutoffs[order][j] exactly when bin > j
+        bins = np.searchsorted(cutoffs[order], values, side='right')
+        bins[np.isnan(values)] = 0
+    return bins, order
+
+#######################################################################################
+def _cumulative_threshold_counts(hist, at_most, axis):
+    """
+    Turns a histogram over threshold bins (see _threshold_bins) into counts meeting each cutoff along one axis.
+    """
+    hist = np.moveaxis(hist, axis, -1)
+    if at_most:
+        counts = np.cumsum(hist, axis=-1)[..., :-1]
+    else:
+        counts = np.cumsum(hist[..., ::-1], axis=-1)[..., ::-1][..., 1:]
+    return np.moveaxis(counts, -1, axis)
+
+#######################################################################################
+def _unsort(counts, order, axis):
+    """
+    Reorders cutoff counts computed on sorted cutoffs back to the caller's cutoff order.
+    """
+    result = np.empty_like(counts)
+    index = [slice(None)] * counts.ndim
+    index[axis] = order
+    result[tuple(index)] = counts
+    return result
+
+#######################################################################################
+def _group_threshold_counts(values, group_ids, n_groups, cutoffs, at_most):
+    """
+    Counts, per group and per cutoff, the rows meeting the cutoff in one bincount and one cumulative sum.
+
+    Returns:
+        np.ndarray: Array of shape (n_groups, len(cutoffs)), columns in the caller's cutoff order.
+    """
+    bins, order = _threshold_bins(values, cutoffs, at_most)
+    valid = group_ids >= 0
+    n_bins = len(order) + 1
+    hist = np.bincount(group_ids[valid] * n_bins + bins[valid], minlength=n_groups * n_bins)
+    counts = _cumulative_threshold_counts(hist.reshape(n_groups, n_bins), at_most, axis=1)
+    return _unsort(counts, order, axis=1)
+
+#######################################################################################
+def summarize_by_domain_association(df, ca_distance_cutoffs=(20, 50), spectral_count_cutoffs=(10, 20),
+                                    include_lists=True, ca_column='CA Distance'):
+    """
+    Uses a packed 'Canonical Pair' key (see canonical_pair_keys) that uniquely identifies crosslinks and
+    summarizes the DataFrame by the 'Domain Association' column, aggregating various statistics. Groups are
+    formed on integer domain codes, so raw residue pair tables are annotated on the fly (see annotate_domains).
+    The input DataFrame is not modified.
     
     Args:
         df (pd.DataFrame): The DataFrame to be prepared and summarized.
+        ca_distance_cutoffs (list): Cutoffs reported as 'Percentage with CA Distance <= cutoff'.
+        spectral_count_cutoffs (list): Cutoffs reported as 'Percentage with Spectral Count >= cutoff'.
+        include_lists (bool): If True, include the per-group lists of CA distances, spectral counts and sequence distances.
+        ca_column (str): Column holding the CA distances, e.g. an ensemble statistic column.
         
     Returns:
         pd.DataFrame: A DataFrame with aggregated statistics for each domain association.
     """
-    # Prepare the DataFrame by adding 'Canonical Pair'
-    df['Canonical Pair'] = df.apply(lambda x: tuple(sorted([x['Residue1'], x['Residue2']])), axis=1)
-
-    # Group by 'Domain Association' and perform aggregations
-    summary_df = df.groupby('Domain Association').agg({
-        'Canonical Pair': 'nunique',
-        'CA Distance': [
-            list, 
-            lambda x: (x <= 20).mean() * 100, 
-            lambda x: (x <= 50).mean() * 100
-        ],
-        'Spectral Count': [
-            list, 
-            lambda x: (x >= 10).mean() * 100, 
-            lambda x: (x >= 20).mean() * 100
-        ],
-        'Sequence Distance': list
-    })
+    # Group on integer association codes rather than the association strings
+    group_ids, association_names = _domain_association_groups(df)
+    n_groups = len(association_names)
+    has_association = group_ids >= 0
+    group_sizes = np.bincount(group_ids[has_association], minlength=n_groups)
+
+    # Unique crosslinks: distinct (group, canonical pair) combinations counted per group
+    pairs = pd.DataFrame({'Group': group_ids, 'Canonical Pair': canonical_pair_keys(df)})[has_association]
+    unique_crosslinks = np.bincount(pairs['Group'][~pairs.duplicated()].to_numpy(), minlength=n_groups)
+
+    ca_percentages = _group_threshold_counts(df[ca_column].to_numpy(), group_ids, n_groups,
+                                             ca_distance_cutoffs, at_most=True) / group_sizes[:, None] * 100
+    spectral_percentages = _group_threshold_counts(df['Spectral Count'].to_numpy(), group_ids, n_groups,
+                                                   spectral_count_cutoffs, at_most=False) / group_sizes[:, None] * 100
+
+    # Raw per-group lists are only built when asked for
+    if include_lists:
+        lists_df = df[has_association].groupby(group_ids[has_association])[
+            [ca_column, 'Spectral Count', 'Sequence Distance']].agg(list)
 
-    # Flatten the MultiIndex in columns created by aggregations and rename columns to be more descriptive
-    summary_df.columns = [
-        'Unique Crosslinks', 
-        'All CA Distances', 
-        'Percentage with CA Distance <= 20', 
-        'Percentage with CA Distance <= 50', 
-        'All Spectral Counts', 
-        'Percentage with Spectral Count >= 10', 
-        'Percentage with Spectral Count >= 20', 
-        'All Sequence Distances'
-    ]
-
-    # Reset index to make 'Domain Association' a column
-    summary_df.reset_index(inplace=True)
+    summary = {'Domain Association': association_names, 'Unique Crosslinks': unique_crosslinks}
+    if include_lists:
+        summary['All CA Distances'] = lists_df[ca_column].tolist()
+    for i, cutoff in enumerate(ca_distance_cutoffs):
+        summary[f'Percentage with CA Distance <= {cutoff}'] = ca_percentages[:, i]
+    if include_lists:
+        summary['All Spectral Counts'] = lists_df['Spectral Count'].tolist()
+    for i, cutoff in enumerate(spectral_count_cutoffs):
+        summary[f'Percentage with Spectral Count >= {cutoff}'] = spectral_percentages[:, i]
+    if include_lists:
+        summary['All Sequence Distances'] = lists_df['Sequence Distance'].tolist()
+
+    summary_df = pd.DataFrame(summary)
 
     return summary_df
 
+#######################################################################################
+def sweep_domain_association_thresholds(df, ca_distance_cutoffs, spectral_count_cutoffs, ca_column='CA Distance'):
+    """
+    Computes, for every domain association, the percentage of crosslinks meeting each CA distance cutoff,
+    each spectral count cutoff and each combination of the two, in one grouped cumulative pass over the data.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'Spectral Count' and CA distance columns and a domain association
+                           (see summarize_by_domain_association).
+        ca_distance_cutoffs (list): CA distance cutoffs (crosslinks with distance <= cutoff are satisfied).
+        spectral_count_cutoffs (list): Spectral count cutoffs (crosslinks with count >= cutoff are kept).
+        ca_column (str): Column holding the CA distances.
+
+    Returns:
+        pd.DataFrame: A tidy DataFrame with one row per domain association, CA distance cutoff and spectral count
+                      cutoff, holding 'Crosslinks' (group size) and the percentages with CA distance <= cutoff,
+                      with spectral count >= cutoff, and meeting both.
+    """
+    group_ids, association_names = _domain_association_groups(df)
+    n_groups = len(association_names)
+    has_association = group_ids >= 0
+    group_sizes = np.bincount(group_ids[has_association], minlength=n_groups)
+
+    # Joint histogram over (group, distance bin, spectral count bin), then cumulative sums along both cutoff axes
+    ca_bins, ca_order = _threshold_bins(df[ca_column].to_numpy(), ca_distance_cutoffs, at_most=True)
+    spectral_bins, spectral_order = _threshold_bins(df['Spectral Count'].to_numpy(), spectral_count_cutoffs,
+                                                    at_most=False)
+    n_ca_bins, n_spectral_bins = len(ca_order) + 1, len(spectral_order) + 1
+    flat_bins = (group_ids * n_ca_bins + ca_bins) * n_spectral_bins + spectral_bins
+    hist = np.bincount(flat_bins[has_association], minlength=n_groups * n_ca_bins * n_spectral_bins)
+    hist = hist.reshape(n_groups, n_ca_bins, n_spectral_bins)
+
+    both = _cumulative_threshold_counts(_cumulative_threshold_counts(hist, True, axis=1), False, axis=2)
+    ca_counts = _cumulative_threshold_counts(hist.sum(axis=2), True, axis=1)
+    spectral_counts = _cumulative_threshold_counts(hist.sum(axis=1), False, axis=1)
+    both = _unsort(_unsort(both, ca_order, axis=1), spectral_order, axis=2)
+    ca_counts = _unsort(ca_counts, ca_order, axis=1)
+    spectral_counts = _unsort(spectral_counts, spectral_order, axis=1)
+
+    # Flatten the (group, distance cutoff, spectral count cutoff) grid into tidy rows
+    n_ca, n_spectral = len(ca_order), len(spectral_order)
+    group_index, ca_index, spectral_index = np.meshgrid(np.arange(n_groups), np.arange(n_ca), np.arange(n_spectral),
+                                                        indexing='ij')
+    group_index, ca_index, spectral_index = group_index.ravel(), ca_index.ravel(), spectral_index.ravel()
+    sizes = group_sizes[group_index]
+
+    sweep_df = pd.DataFrame({
+        'Domain Association': np.asarray(association_names, dtype=object)[group_index],
+        'CA Distance Cutoff': np.asarray(ca_distance_cutoffs)[ca_index],
+        'Spectral Count Cutoff': np.asarray(spectral_count_cutoffs)[spectral_index],
+        'Crosslinks': sizes,
+        'Percentage with CA Distance <= Cutoff': ca_counts[group_index, ca_index] / sizes * 100,
+        'Percentage with Spectral Count >= Cutoff': spectral_counts[group_index, spectral_index] / sizes * 100,
+        'Percentage with Both': both.reshape(-1) / sizes * 100
+    })
+
+    return sweep_df
+
+#######################################################################################
+def _aggregate_by_code(values, codes, n_codes, how):
+    """
+    Aggregates values per integer group code (0..n_codes-1) without sorting, returning one value per code.
+    Sum, mean, min and max use NumPy scatter operations; other pandas aggregation names fall back to groupby.
+    """
+    if how in ('sum', 'mean'):
+        totals = np.bincount(codes, weights=values, minlength=n_codes)
+        if how == 'mean':
+            return totals / np.bincount(codes, minlength=n_codes)
+        return totals.astype(values.dtype) if values.dtype.kind in 'iu' else totals
+    if how in ('min', 'max'):
+        fill = values.max() if how == 'min' else values.min()
+        result = np.full(n_codes, fill if len(values) else 0, dtype=values.dtype)
+        (np.minimum if how == 'min' else np.maximum).at(result, codes, values)
+        return result
+    return pd.Series(values).groupby(codes).agg(how).to_numpy()
+
+#######################################################################################
+def merge_crosslink_datasets(dfs, spectral_count_agg='mean', min_datasets=1):
+    """
+    Merges replicate crosslink tables on canonical pair keys and derives the common, unique and consensus
+    crosslink sets (as in all_common_xlinks_small_and_large.csv and unique_xlinks_*.csv).
+
+    All tables are stacked and factorized once by canonical pair key, so the cost grows with the total number
+    of rows rather than with the number of dataset pairs. A crosslink repeated within one dataset is counted
+    once, using its first row. Output rows take their columns from the first dataset containing the crosslink.
+
+    Args:
+        dfs (list): Replicate DataFrames, each with 'Residue1', 'Residue2' and 'Spectral Count' columns.
+        spectral_count_agg (str): How spectral counts are combined across the datasets containing a crosslink,
+                                  e.g. 'mean', 'min', 'max', 'median' or 'sum'.
+        min_datasets (int): Minimum number of datasets a crosslink must be found in to enter the consensus table.
+
+    Returns:
+        tuple: (common_df, unique_dfs, consensus_df) where common_df holds crosslinks found in every dataset,
+               unique_dfs is a list with the crosslinks found only in each dataset (rows as in the source
+               table), and consensus_df holds crosslinks found in at least min_datasets datasets with an added
+               'Dataset Count' column. Spectral counts in common_df and consensus_df are aggregated.
+    """
+    dfs = list(dfs)
+    if not dfs:
+        raise ValueError("At least one DataFrame is required.")
+    for df in dfs:
+        if not {'Residue1', 'Residue2', 'Spectral Count'}.issubset(df.columns):
+            raise ValueError("Each DataFrame must include 'Residue1', 'Residue2' and 'Spectral Count' columns.")
+
+    # Stack every dataset into one long key array; factorize codes pairs in order of first appearance
+    lengths = np.array([len(df) for df in dfs])
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    dataset_ids = np.repeat(np.arange(len(dfs)), lengths)
+    pair_codes, pair_keys = pd.factorize(np.concatenate([canonical_pair_keys(df) for df in dfs]))
+    n_pairs = len(pair_keys)
+    spectral_counts = np.concatenate([df['Spectral Count'].to_numpy() for df in dfs])
+
+    # Count a crosslink repeated within one dataset only once, using its first row
+    is_first = ~pd.Index(pair_codes * len(dfs) + dataset_ids).duplicated()
+    first_codes = pair_codes[is_first]
+    dataset_counts = np.bincount(first_codes, minlength=n_pairs)
+    aggregated_counts = _aggregate_by_code(spectral_counts[is_first], first_codes, n_pairs, spectral_count_agg)
+
+    # Stacked position of the first row of every crosslink (codes are numbered in that same order)
+    first_positions = np.empty(n_pairs, dtype=np.int64)
+    first_positions[pair_codes[::-1]] = np.arange(len(pair_codes))[::-1]
+
+    combined = pd.concat(dfs, ignore_index=True)
+
+    def _pair_table(selected):
+        # Source rows for the selected crosslinks with the aggregated spectral count
+        pair_df = combined.iloc[first_positions[selected]].reset_index(drop=True)
+        pair_df['Spectral Count'] = aggregated_counts[selected]
+        return pair_df
+
+    common_df = _pair_table(np.flatnonzero(dataset_counts == len(dfs)))
+
+    consensus_pairs = np.flatnonzero(dataset_counts >= min_datasets)
+    consensus_df = _pair_table(consensus_pairs)
+    consensus_df['Dataset Count'] = dataset_counts[consensus_pairs]
+
+    # Crosslinks seen in a single dataset, split back per dataset (stacked positions are ordered by dataset)
+    unique_positions = np.flatnonzero(is_first & (dataset_counts[pair_codes] == 1))
+    boundaries = np.searchsorted(unique_positions, offsets[1:])
+    unique_dfs = [df.iloc[positions - offset].reset_index(drop=True)
+                  for df, offset, positions in zip(dfs, offsets, np.split(unique_positions, boundaries))]
+
+    return common_df, unique_dfs, consensus_df
+
 #######################################################################################
 def save_dataframe_to_csv(df, output_filename):
     """
@@ -173,10 +1188,13 @@ def save_dataframe_to_csv(df, output_filename):
         print(f"An error occurred while saving the DataFrame: {e}")
       
 #######################################################################################
-def filter_by_domain(df, domain_string=None, exclude_intra_domain=True, exclude=False, domains_to_exclude=None):
+def filter_by_domain(df, domain_string=None, exclude_intra_domain=True, exclude=False, domains_to_exclude=None,
+                     index=None):
     """
     Returns a DataFrame containing rows where "Domain Association" column matches specified conditions
     for inter-domain associations or any domain association, optionally excluding specified domains.
+    Matching is done on integer domain codes; tables without a "Domain Association" column are annotated
+    from their residue numbers (see annotate_domains).
 
     Args:
         df (pd.DataFrame): The DataFrame to be filtered.
@@ -185,41 +1203,52 @@ def filter_by_domain(df, domain_string=None, exclude_intra_domain=True, exclude=
         exclude_intra_domain (bool): If True, excludes intra-domain associations.
         exclude (bool): If True, excludes the domains listed in domains_to_exclude.
         domains_to_exclude (list, optional): List of domain names to be excluded.
+        index (CrosslinkIndex, optional): An index built from df; its cached domain codes are reused.
 
     Returns:
         pd.DataFrame: A new DataFrame with rows fitting the filtering criteria.
     """
-    column_name = "Domain Association"
-
-    if column_name not in df.columns:
-        raise ValueError(f"The DataFrame must include a '{column_name}' column.")
-
-    # Function to filter inter-domain associations
-    def filter_inter_domain(x):
-        domains = x.split(" to ")
-        # Check for intra-domain links if required
-        if exclude_intra_domain and len(set(domains)) == 1:
-            return False
-        # Exclude specified domains if required
-        if exclude and domains_to_exclude and any(domain in domains_to_exclude for domain in domains):
-            return False
-        # Handle both specific domain pairs and single domain filters
-        if domain_string:
-            # Split the domain_string to handle directional domain pairs
-            domain_parts = domain_string.split(" to ")
-            if len(domain_parts) == 2:  # Specific domain pair (bi-directional)
-                inverse_string = " to ".join(domain_parts[::-1])
-                if x != domain_string and x != inverse_string:
-                    return False
-            elif not any(domain_string == domain.strip() for domain in domains):  # Single domain in any association
-                return False
-        return True
-
-    # Apply filtering based on the defined criteria
-    filtered_df = df[df[column_name].apply(filter_inter_domain)]
+    filtered_df = XlinkQuery(df, index).domain(domain_string, exclude_intra_domain, exclude, domains_to_exclude).collect()
 
     return filtered_df
 
+#######################################################################################
+def _domain_filter_mask(df, domain_string, exclude_intra_domain, exclude, domains_to_exclude, index):
+    """
+    Computes the boolean row mask of filter_by_domain.
+    """
+    if index is not None:
+        domain1_codes, domain2_codes, domain_names = index.domain_codes()
+    else:
+        domain1_codes, domain2_codes, domain_names = _domain_association_codes(df)
+    name_codes = {name: code for code, name in enumerate(domain_names)}
+    keep = np.ones(len(df), dtype=bool)
+
+    # Exclude intra-domain links if required
+    if exclude_intra_domain:
+        keep &= domain1_codes != domain2_codes
+
+    # Exclude specified domains if required
+    if exclude and domains_to_exclude:
+        excluded_codes = [name_codes[domain] for domain in domains_to_exclude if domain in name_codes]
+        keep &= ~(np.isin(domain1_codes, excluded_codes) | np.isin(domain2_codes, excluded_codes))
+
+    # Handle both specific domain pairs and single domain filters
+    if domain_string:
+        # Split the domain_string to handle directional domain pairs
+        domain_parts = [name_codes.get(domain.strip(), -2) for domain in domain_string.split(" to ")]
+        if len(domain_parts) == 2:  # Specific domain pair (bi-directional)
+            first, second = domain_parts
+            keep &= ((domain1_codes == first) & (domain2_codes == second)) | \
+                    ((domain1_codes == second) & (domain2_codes == first))
+        else:  # Single domain in any association
+            keep &= (domain1_codes == domain_parts[0]) | (domain2_codes == domain_parts[0])
+
+    # Rows with no domain assignment at either end cannot match any domain criteria
+    keep &= (domain1_codes >= 0) & (domain2_codes >= 0)
+
+    return keep
+
 #######################################################################################        
 def format_chimera_dist_selection(df, mod_number):
     """
@@ -228,6 +1257,7 @@ def format_chimera_dist_selection(df, mod_number):
     Args:
         df (pd.DataFrame): DataFrame containing pairs of residues.
                            Expected columns are 'Residue1' and 'Residue2'.
+        mod_number (int or list): ChimeraX model number, or a list of model numbers to repeat the commands for.
 
     Returns:
         str: A single string with each command separated by a newline.
@@ -236,21 +1266,328 @@ def format_chimera_dist_selection(df, mod_number):
     if not {'Residue1', 'Residue2'}.issubset(df.columns):
         raise ValueError("DataFrame must include 'Residue1' and 'Residue2' columns.")
 
-    # Generate formatted strings for each row
-    formatted_strings = [
-        f"distance #{mod_number}:{int(row['Residue1'])}@CA #{mod_number}:{int(row['Residue2'])}@CA" for index, row in df.iterrows()
-    ]
+    return '\n'.join(_crosslink_commands(df, mod_number))
+
+#######################################################################################
+def _crosslink_colors(df, color_by, ca_distance_cutoff, colormap):
+    """
+    Returns one hex color per row: by log spectral count through a colormap, or green/red for crosslinks
+    satisfied/violated at the CA distance cutoff. Returns None when color_by is None.
+    """
+    if color_by is None:
+        return None
+    if color_by == 'spectral count':
+        log_counts = np.log10(np.clip(df['Spectral Count'].to_numpy(dtype=float), 1, None))
+        span = log_counts.max() - log_counts.min() if len(log_counts) else 0
+        scaled = (log_counts - log_counts.min()) / span if span > 0 else np.zeros(len(log_counts))
+        rgb = np.round(plt.get_cmap(colormap)(scaled)[:, :3] * 255).astype(int)
+        return pd.Series(rgb[:, 0] * 65536 + rgb[:, 1] * 256 + rgb[:, 2]).map('#{:06x}'.format).to_numpy()
+    if color_by == 'satisfied':
+        return np.where(df['CA Distance'].to_numpy() <= ca_distance_cutoff, '#00ff00', '#ff0000')
+    raise ValueError("color_by must be None, 'spectral count' or 'satisfied'.")
+
+#######################################################################################
+def _crosslink_commands(df, mod_numbers, program='chimerax', colors=None):
+    """
+    Builds the distance command(s) for every row with column-wise string operations. With several models,
+    each row's commands for all models are joined by newlines.
+
+    Returns:
+        pd.Series: One command string per row, aligned with df.
+    """
+    residue1 = df['Residue1'].astype(np.int64).astype(str)
+    residue2 = df['Residue2'].astype(np.int64).astype(str)
+    models = np.atleast_1d(mod_numbers)
+
+    per_model = []
+    for model in models:
+        if program == 'chimerax':
+            commands = f"distance #{model}:" + residue1 + "@CA #" + str(model) + ":" + residue2 + "@CA"
+            if colors is not None:
+                commands = commands + " color " + colors
+        elif program == 'pymol':
+            names = f"xl_{model}_" + residue1 + "_" + residue2
+            commands = ("distance " + names + ", " + f"{model} and resi " + residue1 + " and name CA, "
+                        + f"{model} and resi " + residue2 + " and name CA")
+            if colors is not None:
+                commands = commands + "\ncolor " + pd.Series(colors, index=df.index).str.replace('#', '0x') + ", " + names
+        else:
+            raise ValueError("program must be 'chimerax' or 'pymol'.")
+        per_model.append(commands)
+
+    commands = per_model[0]
+    for model_commands in per_model[1:]:
+        commands = commands + '\n' + model_commands
+    return commands
+
+#######################################################################################
+def write_crosslink_scripts(df, output_dir, mod_numbers=1, group_by='Domain Association', program='chimerax',
+                            color_by=None, ca_distance_cutoff=26, colormap='viridis', radius=0.5, dashes=0,
+                            prefix='xlinks'):
+    """
+    Writes ChimeraX (.cxc) or PyMOL (.pml) scripts that draw every crosslink as a CA-CA distance, one file per
+    group of crosslinks, building all commands in one vectorized pass.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'Residue1' and 'Residue2' columns (plus 'Spectral Count' or 'CA Distance'
+                           when used for coloring).
+        output_dir (str): Directory the scripts are written to (created if needed).
+        mod_numbers (int or list): ChimeraX model number(s), or PyMOL object name(s), to draw the crosslinks on.
+        group_by (str or array-like, optional): Column name, or one label per row (e.g. a pd.cut of the spectral
+                                                counts into threshold buckets); one file is written per group.
+                                                If None, all crosslinks go into a single file.
+        program (str): 'chimerax' or 'pymol'.
+        color_by (str, optional): None for a single color, 'spectral count' to color through the colormap by log
+                                  spectral count, or 'satisfied' to color crosslinks with CA Distance <= the cutoff
+                                  green and the others red.
+        ca_distance_cutoff (float): Cutoff used with color_by='satisfied'.
+        colormap (str): Matplotlib colormap used with color_by='spectral count'.
+        radius (float): Pseudobond radius (ChimeraX) or dash radius (PyMOL).
+        dashes (int): Number of dashes per pseudobond (ChimeraX), 0 for solid.
+        prefix (str): File name prefix.
+
+    Returns:
+        list: Paths of the files written.
+    """
+    if not {'Residue1', 'Residue2'}.issubset(df.columns):
+        raise ValueError("DataFrame must include 'Residue1' and 'Residue2' columns.")
+
+    colors = _crosslink_colors(df, color_by, ca_distance_cutoff, colormap)
+    commands = _crosslink_commands(df, mod_numbers, program, colors)
+
+    if program == 'chimerax':
+        header = f"distance style radius {radius} dashes {dashes}" + (" color green" if colors is None else "")
+        extension = '.cxc'
+    else:
+        header = f"set dash_radius, {radius}\nhide labels" + ("\nset dash_gap, 0" if dashes == 0 else "")
+        extension = '.pml'
+
+    if group_by is None:
+        groups = {'all': np.arange(len(df))}
+    else:
+        labels = df[group_by] if isinstance(group_by, str) else pd.Series(np.asarray(group_by), index=df.index)
+        groups = pd.Series(np.arange(len(df))).groupby(labels.to_numpy(), observed=True, sort=True).indices
+
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for label, rows in groups.items():
+        file_name = f"{prefix}_{re.sub(r'[^A-Za-z0-9.]+', '_', str(label)).strip('_')}{extension}"
+        file_path = os.path.join(output_dir, file_name)
+        with open(file_path, 'w') as handle:
+            handle.write(header + '\n' + '\n'.join(commands.iloc[rows]) + '\n')
+        written.append(file_path)
+
+    return written
+
+#######################################################################################
+def _expand_ranges(starts, stops):
+    """
+    Concatenates the integer ranges [starts[i], stops[i]) into one array without a Python loop.
+
+    Returns:
+        tuple: The concatenated positions and, for each position, the index i of the range it came from.
+    """
+    lengths = np.maximum(stops - starts, 0)
+    range_ids = np.repeat(np.arange(len(starts)), lengths)
+    range_offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return starts[range_ids] + range_offsets, range_ids
+
+#######################################################################################
+class CrosslinkIndex:
+    """
+    Residue-pair index over a crosslink DataFrame, built once and queried many times.
+
+    Each unique crosslink (first occurrence of its canonical pair, as in filter_by_residue) is stored
+    under both of its residues in a CSR-style adjacency indexed directly by residue number:
+    indptr[r]:indptr[r + 1] slices partners (the residue at the other end) and rows (positional row
+    numbers in the source DataFrame), with rows ascending within each residue.
+
+    Args:
+        df (pd.DataFrame): DataFrame with non-negative 'Residue1' and 'Residue2' residue numbers.
+    """
+
+    def __init__(self, df):
+        self.df = df
+
+        # First occurrence of every canonical pair, sorted by key for pair lookups
+        keys = canonical_pair_keys(df)
+        unique_rows = np.flatnonzero(~pd.Index(keys).duplicated())
+        key_order = np.argsort(keys[unique_rows], kind='stable')
+        self.pair_keys = keys[unique_rows][key_order]
+        self.pair_rows = unique_rows[key_order]
+
+        residue1 = df['Residue1'].to_numpy(dtype=np.int64)[unique_rows]
+        residue2 = df['Residue2'].to_numpy(dtype=np.int64)[unique_rows]
+        if len(unique_rows) and min(residue1.min(), residue2.min()) < 0:
+            raise ValueError("Residue numbers must be non-negative to build a CrosslinkIndex.")
+
+        # Store each link under both ends (self-links only once), ordered by residue then row
+        not_self = residue1 != residue2
+        ends = np.concatenate([residue1, residue2[not_self]])
+        partners = np.concatenate([residue2, residue1[not_self]])
+        rows = np.concatenate([unique_rows, unique_rows[not_self]])
+        order = np.lexsort((rows, ends))
+        self.partners = partners[order]
+        self.rows = rows[order]
 
-    return '\n'.join(formatted_strings)
+        n_residues = int(ends.max()) + 1 if len(ends) else 0
+        self.indptr = np.zeros(n_residues + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ends, minlength=n_residues), out=self.indptr[1:])
+
+        self._domain_codes = None
+
+    def __len__(self):
+        return len(self.pair_keys)
+
+    def _residue_bounds(self, residues, side_offset=0):
+        # Clip residue numbers into the indptr so out-of-range residues map to empty slices
+        return self.indptr[np.clip(np.asarray(residues, dtype=np.int64) + side_offset, 0, len(self.indptr) - 1)]
+
+    def domain_codes(self):
+        """
+        Returns the integer domain codes for both ends of every row (see annotate_domains), computed once
+        per index and reused by filter_by_domain.
+
+        Returns:
+            tuple: Two np.ndarray objects of domain codes (-1 for missing) and the list of domain names.
+        """
+        if self._domain_codes is None:
+            self._domain_codes = _domain_association_codes(self.df)
+        return self._domain_codes
+
+    def partners_of(self, residue):
+        """
+        Returns the residues crosslinked to a residue.
+
+        Args:
+            residue (int): Residue number.
+
+        Returns:
+            np.ndarray: Partner residue numbers, in source row order.
+        """
+        return self.partners[self._residue_bounds(residue):self._residue_bounds(residue, 1)]
+
+    def links_for_residues(self, residues):
+        """
+        Returns the unique crosslinks involving each of several residues.
+
+        Args:
+            residues (list): Residue numbers to query.
+
+        Returns:
+            pd.DataFrame: Matching rows of the source DataFrame grouped in query order, with a 'Query Residue' column.
+        """
+        residues = np.atleast_1d(np.asarray(residues, dtype=np.int64))
+        positions, query_ids = _expand_ranges(self._residue_bounds(residues), self._residue_bounds(residues, 1))
+
+        links_df = self.df.iloc[self.rows[positions]].copy()
+        links_df['Query Residue'] = residues[query_ids]
+        return links_df
+
+    def links_for_residue(self, residue):
+        """
+        Returns the unique crosslinks involving a residue; equivalent to filter_by_residue.
+
+        Args:
+            residue (int): Residue number.
+
+        Returns:
+            pd.DataFrame: Matching rows of the source DataFrame in their original order.
+        """
+        return self.df.iloc[self.rows[self._residue_bounds(residue):self._residue_bounds(residue, 1)]]
+
+    def links_between_pairs(self, residues_a, residues_b):
+        """
+        Looks up the crosslink between each pair of residues, in either orientation.
+
+        Args:
+            residues_a (list): First residue of each query pair.
+            residues_b (list): Second residue of each query pair.
+
+        Returns:
+            pd.DataFrame: The first source row for every query pair that was crosslinked, in query order.
+        """
+        residues_a = np.atleast_1d(np.asarray(residues_a, dtype=np.int64))
+        residues_b = np.atleast_1d(np.asarray(residues_b, dtype=np.int64))
+        query_keys = (np.minimum(residues_a, residues_b) << 32) | np.maximum(residues_a, residues_b)
+
+        positions = np.searchsorted(self.pair_keys, query_keys)
+        positions = np.minimum(positions, max(len(self.pair_keys) - 1, 0))
+        found = self.pair_keys[positions] == query_keys if len(self.pair_keys) else np.zeros(len(query_keys), dtype=bool)
+        return self.df.iloc[self.pair_rows[positions[found]]]
+
+    def links_between(self, residue_a, residue_b):
+        """
+        Returns the crosslink between two residues, in either orientation.
+
+        Args:
+            residue_a (int): First residue number.
+            residue_b (int): Second residue number.
+
+        Returns:
+            pd.DataFrame: The first source row for the pair, or an empty DataFrame if they are not crosslinked.
+        """
+        return self.links_between_pairs([residue_a], [residue_b])
+
+    def links_in_windows(self, starts, ends, both_ends=True):
+        """
+        Returns the unique crosslinks within each of several inclusive residue windows.
+
+        Args:
+            starts (list): First residue of each window.
+            ends (list): Last residue of each window.
+            both_ends (bool): If True, both residues must lie in the window; if False, one is enough.
+
+        Returns:
+            pd.DataFrame: Matching rows of the source DataFrame grouped by window, in original order within each
+                          window, with a 'Query Window' column holding the window's position in the query.
+        """
+        starts = np.atleast_1d(np.asarray(starts, dtype=np.int64))
+        ends = np.atleast_1d(np.asarray(ends, dtype=np.int64))
+        positions, query_ids = _expand_ranges(self._residue_bounds(starts), self._residue_bounds(ends, 1))
+
+        if both_ends:
+            partners = self.partners[positions]
+            inside = (partners >= starts[query_ids]) & (partners <= ends[query_ids])
+            positions, query_ids = positions[inside], query_ids[inside]
+
+        # Links with both ends in a window were reached twice; keep one per (window, row), sorted
+        window_rows = np.unique((query_ids.astype(np.int64) << 32) | self.rows[positions])
+        links_df = self.df.iloc[window_rows & 0xFFFFFFFF].copy()
+        links_df['Query Window'] = window_rows >> 32
+        return links_df
+
+    def links_in_window(self, start, end, both_ends=True):
+        """
+        Returns the unique crosslinks within an inclusive residue window.
+
+        Args:
+            start (int): First residue of the window.
+            end (int): Last residue of the window.
+            both_ends (bool): If True, both residues must lie in the window; if False, one is enough.
+
+        Returns:
+            pd.DataFrame: Matching rows of the source DataFrame in their original order.
+        """
+        return self.links_in_windows([start], [end], both_ends=both_ends).drop(columns=['Query Window'])
+
+#######################################################################################
+def _check_index(df, index):
+    """
+    Raises a ValueError if a CrosslinkIndex was not built from the given DataFrame.
+    """
+    if index.df is not df:
+        raise ValueError("The CrosslinkIndex must be built from the DataFrame being filtered.")
 
 #######################################################################################   
-def filter_by_residue(df, residue):
+def filter_by_residue(df, residue, index=None):
     """
     Filters a DataFrame to include only unique crosslinks that involve a specified residue, returning all original columns.
 
     Args:
         df (pd.DataFrame): The DataFrame to be filtered, expected to have 'Residue1' and 'Residue2' columns.
         residue (int): The specific residue number to filter for crosslinks.
+        index (CrosslinkIndex, optional): An index built from df; the query is answered from it without scanning df.
 
     Returns:
         pd.DataFrame: A new filtered DataFrame with unique crosslinks involving the specified residue, including all original columns.
@@ -258,27 +1595,17 @@ def filter_by_residue(df, residue):
     if 'Residue1' not in df.columns or 'Residue2' not in df.columns:
         raise ValueError("DataFrame must include 'Residue1' and 'Residue2' columns.")
 
-    # Use .copy() to ensure the operations are performed on a copy of the data, avoiding SettingWithCopyWarning
-    df = df.copy()
+    if index is not None:
+        _check_index(df, index)
+        return index.links_for_residue(residue)
 
-    # Create a canonical form of crosslink pairs to identify unique links
-    df['Canonical Pair'] = df.apply(lambda x: tuple(sorted([x['Residue1'], x['Residue2']])), axis=1)
-
-    # Remove duplicates based on the canonical pair
-    df_deduplicated = df.drop_duplicates(subset='Canonical Pair')
-
-    # Filter for pairs that include the specified residue
-    filtered_df = df_deduplicated[
-        (df_deduplicated['Residue1'] == residue) | (df_deduplicated['Residue2'] == residue)
-    ]
-
-    # Drop the 'Canonical Pair' column to clean up the DataFrame before returning
-    filtered_df = filtered_df.drop(columns=['Canonical Pair'])
+    # Keep the first occurrence of each canonical pair involving the residue, as drop_duplicates would
+    filtered_df = XlinkQuery(df).residue(residue).collect()
 
     return filtered_df
 
 #######################################################################################
-def filter_by_ca_distance(df, ca_distance_cutoff, comparison_type):
+def filter_by_ca_distance(df, ca_distance_cutoff, comparison_type, column='CA Distance'):
     """
     Filters a DataFrame to include only rows where the C-alpha distance meets a specified comparison (less than or greater than) to a cutoff.
 
@@ -286,23 +1613,239 @@ def filter_by_ca_distance(df, ca_distance_cutoff, comparison_type):
         df (pd.DataFrame): The DataFrame to be filtered, expected to have a 'CA Distance' column.
         ca_distance_cutoff (float): The cutoff value for C-alpha distances.
         comparison_type (str): Type of comparison, 'less' for <= and 'greater' for >=.
+        column (str): The distance column to compare, e.g. 'CA Distance mod1' or an ensemble statistic column.
 
     Returns:
         pd.DataFrame: A new filtered DataFrame with rows where 'CA Distance' meets the comparison criteria.
     """
-    if 'CA Distance' not in df.columns:
-        raise ValueError("DataFrame must include a 'CA Distance' column.")
-    
-    # Determine the type of filter based on the comparison_type
-    if comparison_type == 'less':
-        filtered_df = df[df['CA Distance'] <= ca_distance_cutoff]
-    elif comparison_type == 'greater':
-        filtered_df = df[df['CA Distance'] >= ca_distance_cutoff]
-    else:
-        raise ValueError("comparison_type must be 'less' or 'greater'.")
+    filtered_df = XlinkQuery(df).ca(ca_distance_cutoff, comparison_type, column).collect()
 
     return filtered_df
 
+#######################################################################################
+class XlinkQuery:
+    """
+    Lazy crosslink filter. Each method records a predicate and returns a new query, so chains can branch;
+    nothing is evaluated until mask() or collect(), which fuse every predicate into a single boolean row mask
+    over the original DataFrame instead of materializing intermediate tables. The filter_by_* functions
+    are one-predicate queries.
+
+    Example:
+        XlinkQuery(df).spectral(20).domain('insert 9').ca(26).collect()
+    """
+
+    # Columns each predicate reads, hashed into the filter cache key
+    _PREDICATE_COLUMNS = {
+        'spectral': ['Spectral Count'],
+        'domain': ['Residue1', 'Residue2', 'Domain1', 'Domain2', 'Domain Association'],
+        'ca': [],
+        'residue': ['Residue1', 'Residue2']
+    }
+
+    def __init__(self, df, index=None):
+        if index is not None:
+            _check_index(df, index)
+        self.df = df
+        self.index = index
+        self.predicates = ()
+
+    def __repr__(self):
+        return f"XlinkQuery({len(self.df)} rows, predicates={list(self.predicates)})"
+
+    def _extend(self, predicate):
+        query = XlinkQuery(self.df, self.index)
+        query.predicates = self.predicates + (predicate,)
+        return query
+
+    def spectral(self, spectral_count_threshold):
+        """
+        Keeps rows whose 'Spectral Count' is greater than or equal to the threshold.
+        """
+        if 'Spectral Count' not in self.df.columns:
+            raise ValueError("DataFrame must include a 'Spectral Count' column.")
+        return self._extend(('spectral', spectral_count_threshold))
+
+    def domain(self, domain_string=None, exclude_intra_domain=True, exclude=False, domains_to_exclude=None):
+        """
+        Keeps rows matching the domain criteria of filter_by_domain.
+        """
+        return self._extend(('domain', domain_string, exclude_intra_domain, exclude,
+                             tuple(domains_to_exclude or ())))
+
+    def ca(self, ca_distance_cutoff, comparison_type='less', column='CA Distance'):
+        """
+        Keeps rows whose distance column is <= ('less') or >= ('greater') the cutoff.
+        """
+        if column not in self.df.columns:
+            raise ValueError(f"DataFrame must include a '{column}' column.")
+        if comparison_type not in ('less', 'greater'):
+            raise ValueError("comparison_type must be 'less' or 'greater'.")
+        return self._extend(('ca', ca_distance_cutoff, comparison_type, column))
+
+    def residue(self, residue):
+        """
+        Keeps the first occurrence of each unique crosslink involving the residue, among the rows kept by the
+        predicates recorded before this one.
+        """
+        if 'Residue1' not in self.df.columns or 'Residue2' not in self.df.columns:
+            raise ValueError("DataFrame must include 'Residue1' and 'Residue2' columns.")
+        return self._extend(('residue', residue))
+
+    def _compile(self):
+        df = self.df
+        keep = np.ones(len(df), dtype=bool)
+
+        for kind, *args in self.predicates:
+            if kind == 'spectral':
+                keep &= (df['Spectral Count'] >= args[0]).to_numpy()
+            elif kind == 'domain':
+                keep &= _domain_filter_mask(df, *args, self.index)
+            elif kind == 'ca':
+                cutoff, comparison_type, column = args
+                keep &= (df[column] <= cutoff if comparison_type == 'less' else df[column] >= cutoff).to_numpy()
+            elif kind == 'residue':
+                # Every copy of a canonical pair involves the residue, so deduplicating the hits alone keeps
+                # the same first occurrences as deduplicating all kept rows
+                hits = np.flatnonzero(keep & ((df['Residue1'] == args[0]) | (df['Residue2'] == args[0])).to_numpy())
+                is_first = ~pd.Index(canonical_pair_keys(df.iloc[hits])).duplicated()
+                keep = np.zeros(len(df), dtype=bool)
+                keep[hits[is_first]] = True
+
+        return keep
+
+    def _columns(self):
+        columns = []
+        for kind, *args in self.predicates:
+            columns += self._PREDICATE_COLUMNS[kind] + ([args[2]] if kind == 'ca' else [])
+        return list(dict.fromkeys(columns))
+
+    def mask(self):
+        """
+        Evaluates every recorded predicate in one pass.
+
+        Returns:
+            np.ndarray: Boolean mask over the rows of the original DataFrame. While the filter cache is enabled
+                        the mask is shared with later calls and read-only.
+        """
+        def compute():
+            mask = self._compile()
+            mask.flags.writeable = False
+            return mask
+
+        return _cached_call('XlinkQuery', self.df, self._columns(), self.predicates, compute,
+                            lambda mask: mask.nbytes)
+
+    def collect(self):
+        """
+        Evaluates the query.
+
+        Returns:
+            pd.DataFrame: The rows of the original DataFrame kept by every predicate. While the filter cache is
+                          enabled this may be the DataFrame itself or a slice view of it (see enable_filter_cache).
+        """
+        mask = self.mask()
+        if _FILTER_CACHE is not None:
+            return _apply_row_mask(self.df, mask)
+        return self.df[mask]
+
+#######################################################################################
+def _ca_distance_values(df, column=None):
+    """
+    Returns the CA distances used for cumulative plots: the named column if given, otherwise the minimum over
+    the per-model 'CA Distance mod<N>' columns, falling back to 'CA Distance' when there are no model columns.
+    """
+    if column is not None:
+        if column not in df.columns:
+            raise ValueError(f"DataFrame must include a '{column}' column.")
+        return df[column].to_numpy(dtype=float)
+
+    model_columns = [name for name in df.columns if re.fullmatch(r'CA Distance mod\s*\d+', str(name))]
+    if model_columns:
+        return np.fmin.reduce(df[model_columns].to_numpy(dtype=float), axis=1)
+    if 'CA Distance' in df.columns:
+        return df['CA Distance'].to_numpy(dtype=float)
+    raise ValueError("DataFrame must include 'CA Distance mod<N>' columns or a 'CA Distance' column.")
+
+#######################################################################################
+def _ecdf_from_sorted(sorted_distances):
+    """
+    Builds the (distance, cumulative percentage) curve from already sorted, NaN-free distances.
+    """
+    return sorted_distances, np.arange(1, len(sorted_distances) + 1) / max(len(sorted_distances), 1) * 100
+
+#######################################################################################
+def ca_distance_ecdf(df, column=None):
+    """
+    Computes the cumulative percentage of crosslinks at or below each CA distance (the empirical CDF).
+
+    Args:
+        df (pd.DataFrame): The crosslink DataFrame.
+        column (str, optional): CA distance column to use. By default the minimum CA distance over the
+                                'CA Distance mod1'/'CA Distance mod2' columns is used.
+
+    Returns:
+        tuple: Two np.ndarray objects, the sorted CA distances and the cumulative percentage at each distance.
+               Rows without a distance are left out.
+    """
+    distances = _ca_distance_values(df, column)
+    return _ecdf_from_sorted(np.sort(distances[~np.isnan(distances)]))
+
+#######################################################################################
+def ca_distance_ecdf_by_spectral_count(df, spectral_count_thresholds, column=None):
+    """
+    Computes CA distance ECDFs for several spectral count subsets of one DataFrame, sorting the parent
+    distances once and selecting each subset from the sorted order.
+
+    Args:
+        df (pd.DataFrame): The crosslink DataFrame, with a 'Spectral Count' column.
+        spectral_count_thresholds (list): Minimum spectral count of each subset; None keeps every crosslink.
+        column (str, optional): CA distance column to use (see ca_distance_ecdf).
+
+    Returns:
+        list: One (sorted distances, cumulative percentages) tuple per threshold, as returned by ca_distance_ecdf.
+    """
+    distances = _ca_distance_values(df, column)
+    order = np.argsort(distances, kind='stable')
+    order = order[~np.isnan(distances[order])]
+    sorted_distances = distances[order]
+
+    curves = []
+    for threshold in spectral_count_thresholds:
+        if threshold is None:
+            curves.append(_ecdf_from_sorted(sorted_distances))
+        else:
+            in_subset = df['Spectral Count'].to_numpy()[order] >= threshold
+            curves.append(_ecdf_from_sorted(sorted_distances[in_subset]))
+    return curves
+
+#######################################################################################
+def plot_ca_distance_cumulative_percentage(df, label=None, column=None, ax=None, curve=None):
+    """
+    Plots the cumulative percentage of crosslinks at or below each CA distance onto the current figure.
+
+    Args:
+        df (pd.DataFrame): The crosslink DataFrame. Not used if curve is given.
+        label (str, optional): Legend label for the curve.
+        column (str, optional): CA distance column to use (see ca_distance_ecdf); defaults to the minimum
+                                over the two models.
+        ax (matplotlib.axes.Axes, optional): Axes to draw on. Defaults to the current axes.
+        curve (tuple, optional): A precomputed (distances, percentages) curve, e.g. from
+                                 ca_distance_ecdf_by_spectral_count.
+
+    Returns:
+        tuple: The plotted (distances, percentages) arrays.
+    """
+    if curve is None:
+        curve = ca_distance_ecdf(df, column)
+    if ax is None:
+        ax = plt.gca()
+
+    distances, percentages = curve
+    ax.step(distances, percentages, where='post', label=label)
+    ax.grid(True)
+
+    return distances, percentages
+
 #######################################################################################      
 def calculate_average_and_stdev_of_column(df, column_name):
     """
@@ -327,3 +1870,68 @@ def calculate_average_and_stdev_of_column(df, column_name):
     except TypeError:
         print(f"Error: The column '{column_name}' contains non-numeric data.")
         return None
+
+#######################################################################################
+# Per-function call counts and times while timing is enabled, and the unwrapped functions to restore
+_FUNCTION_TIMINGS = None
+_TIMED_FUNCTIONS = {}
+
+#######################################################################################
+def enable_function_timing():
+    """
+    Wraps every public function of this module (classes are left alone) so that each call records its
+    wall time. Times are inclusive: a function calling another public
+    function is charged for both. Calls made through references taken before enabling are not timed.
+    """
+    global _FUNCTION_TIMINGS
+    if _FUNCTION_TIMINGS is not None:
+        return
+    _FUNCTION_TIMINGS = {}
+
+    untimed = {'enable_function_timing', 'disable_function_timing', 'function_timing_report',
+               'enable_filter_cache', 'disable_filter_cache', 'filter_cache_info'}
+    module_globals = globals()
+    for name, function in list(module_globals.items()):
+        if (name.startswith('_') or name in untimed or not callable(function) or isinstance(function, type)
+                or getattr(function, '__module__', None) != __name__):
+            continue
+        _TIMED_FUNCTIONS[name] = function
+        module_globals[name] = _timed(name, function)
+
+#######################################################################################
+def _timed(name, function):
+    """
+    Returns a wrapper of function that adds its call count and wall time to _FUNCTION_TIMINGS[name].
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            calls, seconds = _FUNCTION_TIMINGS.get(name, (0, 0.0))
+            _FUNCTION_TIMINGS[name] = (calls + 1, seconds + time.perf_counter() - start)
+    return wrapper
+
+#######################################################################################
+def disable_function_timing():
+    """
+    Restores the unwrapped functions and drops the recorded times.
+    """
+    global _FUNCTION_TIMINGS
+    globals().update(_TIMED_FUNCTIONS)
+    _TIMED_FUNCTIONS.clear()
+    _FUNCTION_TIMINGS = None
+
+#######################################################################################
+def function_timing_report():
+    """
+    Summarizes the calls recorded since enable_function_timing.
+
+    Returns:
+        pd.DataFrame: 'Function', 'Calls', 'Total Time (s)' and 'Mean Time (s)', slowest first.
+    """
+    rows = [{'Function': name, 'Calls': calls, 'Total Time (s)': seconds, 'Mean Time (s)': seconds / calls}
+            for name, (calls, seconds) in (_FUNCTION_TIMINGS or {}).items()]
+    report_df = pd.DataFrame(rows, columns=['Function', 'Calls', 'Total Time (s)', 'Mean Time (s)'])
+    return report_df.sort_values('Total Time (s)', ascending=False, ignore_index=True)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Title: Headless Batch Runner for the Crosslinking Analysis
+Date: October 2026
+Description:
+    Runs the analysis of xlink_analysis_script.py non-interactively for every combination of datasets,
+    spectral count thresholds, domains and residues listed in a JSON config, spreading the jobs over a
+    process pool. Figures are saved with the Agg backend instead of being shown.
+
+    Usage: python xlink_batch_runner.py config.json [--output-dir DIR] [--n-workers N]
+
+    Example config:
+        {
+            "sequence": "MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEV...",
+            "datasets": {"common": "all_common_xlinks_small_and_large.csv", "small": "all_xlinks_small.csv"},
+            "spectral_count_thresholds": [10, 20],
+            "domains": ["insert 9 to insert 9", "NTD"],
+            "residues": [4207],
+            "ca_distance_cutoffs": [20, 26, 50],
+            "sweep_spectral_count_cutoffs": [1, 10, 20],
+            "mod_number": 1,
+            "output_dir": "batch_output",
+            "cache_dir": ".xlink_cache"
+        }
+    "sequence_file" (plain text or FASTA) can be given instead of "sequence".
+"""
+
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+
+import xlink_analysis_functions as xlf
+
+# Tables and indices shared by every job in a process, set by _init_worker
+_SHARED = {}
+
+#######################################################################################
+def _init_worker(shared):
+    """
+    Installs the parsed tables and derived indices in a worker process once, so jobs do not re-read them.
+    """
+    _SHARED.update(shared)
+
+#######################################################################################
+def _safe_name(value):
+    """
+    Turns a dataset, domain or threshold label into a file name component.
+    """
+    return re.sub(r'[^A-Za-z0-9.]+', '_', str(value)).strip('_')
+
+#######################################################################################
+def _job_dir(output_dir, dataset, threshold):
+    """
+    Returns (and creates) the output directory of one dataset and spectral count threshold.
+    """
+    job_dir = os.path.join(output_dir, _safe_name(dataset), f"sc{_safe_name(threshold)}")
+    os.makedirs(job_dir, exist_ok=True)
+    return job_dir
+
+#######################################################################################
+def _summary_job(dataset, threshold, config):
+    """
+    Domain statistics and domain association summary for one filtered table.
+    """
+    df = _SHARED['tables'][(dataset, threshold)]
+    job_dir = _job_dir(config['output_dir'], dataset, threshold)
+    written = []
+
+    summaries = [
+        ('summary_by_domain.csv', xlf.domain_crosslink_stats(df, _SHARED['sequence'])),
+        ('summary_by_domain_association.csv', xlf.summarize_by_domain_association(df))
+    ]
+    for file_name, summary_df in summaries:
+        written.append(os.path.join(job_dir, file_name))
+        xlf.save_dataframe_to_csv(summary_df, written[-1])
+
+    return written
+
+#######################################################################################
+def _sweep_job(dataset, config):
+    """
+    Threshold sweep over the CA distance and spectral count cutoffs for one unfiltered dataset.
+    """
+    sweep_df = xlf.sweep_domain_association_thresholds(_SHARED['datasets'][dataset], config['ca_distance_cutoffs'],
+                                                       config['sweep_spectral_count_cutoffs'])
+
+    output_file = os.path.join(config['output_dir'], _safe_name(dataset), 'threshold_sweep_by_domain_association.csv')
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    xlf.save_dataframe_to_csv(sweep_df, output_file)
+
+    return [output_file]
+
+#######################################################################################
+def _ecdf_job(dataset, config):
+    """
+    Cumulative CA distance plot of one dataset, overlaying every spectral count threshold from a single sort.
+    """
+    df = _SHARED['datasets'][dataset]
+    thresholds = [None] + list(config['spectral_count_thresholds'])
+    curves = xlf.ca_distance_ecdf_by_spectral_count(df, thresholds)
+
+    fig = plt.figure(figsize=(10, 6))
+    for threshold, curve in zip(thresholds, curves):
+        label = "All Data" if threshold is None else f"Spectral Count >= {threshold}"
+        xlf.plot_ca_distance_cumulative_percentage(df, label=label, curve=curve)
+    for cutoff in config['ca_distance_cutoffs']:
+        plt.axvline(x=cutoff, color='r', linestyle='--')
+    plt.xlabel('C-alpha Distance (Å)', fontsize=16)
+    plt.ylabel('Cumulative Percentage (%)', fontsize=16)
+    plt.legend(fontsize=14)
+    plt.title('Cumulative Percentage of Crosslinks <= C-alpha Distance', fontsize=16)
+
+    output_file = os.path.join(config['output_dir'], _safe_name(dataset), 'ca_distance_cumulative_percentage.png')
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    fig.savefig(output_file, dpi=150)
+    plt.close(fig)
+
+    return [output_file]
+
+#######################################################################################
+def _domain_job(dataset, threshold, domain, config):
+    """
+    Crosslinks of one domain or domain pair, as a table and a ChimeraX script.
+    """
+    df = _SHARED['tables'][(dataset, threshold)]
+    domain_df = xlf.filter_by_domain(df, domain_string=domain, exclude_intra_domain=config['exclude_intra_domain'],
+                                     index=_SHARED['indices'][(dataset, threshold)])
+    job_dir = _job_dir(config['output_dir'], dataset, threshold)
+
+    output_file = os.path.join(job_dir, f"domain_{_safe_name(domain)}.csv")
+    xlf.save_dataframe_to_csv(domain_df, output_file)
+    script_files = xlf.write_crosslink_scripts(domain_df, job_dir, mod_numbers=config['mod_number'], group_by=None,
+                                               prefix=f"domain_{_safe_name(domain)}")
+
+    return [output_file] + script_files
+
+#######################################################################################
+def _residue_job(dataset, threshold, residue, config):
+    """
+    Unique crosslinks of one residue.
+    """
+    df = _SHARED['tables'][(dataset, threshold)]
+    residue_df = xlf.filter_by_residue(df, residue, index=_SHARED['indices'][(dataset, threshold)])
+
+    output_file = os.path.join(_job_dir(config['output_dir'], dataset, threshold), f"residue_{residue}.csv")
+    xlf.save_dataframe_to_csv(residue_df, output_file)
+
+    return [output_file]
+
+#######################################################################################
+def _run_job(job):
+    """
+    Runs one job tuple (job function name, arguments...) in the current process.
+    """
+    job_functions = {'summary': _summary_job, 'sweep': _sweep_job, 'ecdf': _ecdf_job, 'domain': _domain_job,
+                     'residue': _residue_job}
+    return job_functions[job[0]](*job[1:])
+
+#######################################################################################
+def load_config(config_path):
+    """
+    Reads a batch config file and fills in defaults.
+
+    Args:
+        config_path (str): Path to the JSON config.
+
+    Returns:
+        dict: The config with every key set.
+    """
+    with open(config_path) as handle:
+        config = json.load(handle)
+
+    if 'sequence' not in config:
+        if 'sequence_file' not in config:
+            raise ValueError("The config must include 'sequence' or 'sequence_file'.")
+        with open(config['sequence_file']) as handle:
+            config['sequence'] = ''.join(line.strip() for line in handle if not line.startswith('>'))
+    if not config.get('datasets'):
+        raise ValueError("The config must list at least one dataset.")
+
+    defaults = {
+        'spectral_count_thresholds': [10, 20],
+        'domains': [],
+        'residues': [],
+        'ca_distance_cutoffs': [20, 26, 50],
+        'sweep_spectral_count_cutoffs': [1, 10, 20],
+        'exclude_intra_domain': False,
+        'mod_number': 1,
+        'output_dir': 'batch_output',
+        'cache_dir': None,
+        'n_workers': None
+    }
+    for key, value in defaults.items():
+        config.setdefault(key, value)
+
+    return config
+
+#######################################################################################
+def run_batch(config):
+    """
+    Runs every job described by a config: per dataset an ECDF plot and a threshold sweep; per dataset and spectral count threshold
+    the domain summaries; and per dataset, threshold and domain / residue the filtered tables. Tables are
+    parsed once and filtered tables and their CrosslinkIndex objects are built once, then shared with every
+    worker process.
+
+    Args:
+        config (dict): Config as returned by load_config.
+
+    Returns:
+        list: Paths of every file written.
+    """
+    datasets = {name: xlf.read_csv_with_header(path, cache_dir=config['cache_dir'])
+                for name, path in config['datasets'].items()}
+
+    tables, indices = {}, {}
+    for name, df in datasets.items():
+        for threshold in config['spectral_count_thresholds']:
+            tables[(name, threshold)] = xlf.filter_by_spectral_count(df, threshold)
+            indices[(name, threshold)] = xlf.CrosslinkIndex(tables[(name, threshold)])
+            indices[(name, threshold)].domain_codes()
+    shared = {'sequence': config['sequence'], 'datasets': datasets, 'tables': tables, 'indices': indices}
+
+    jobs = [(kind, name, config) for name in datasets for kind in ('ecdf', 'sweep')]
+    for name, threshold in tables:
+        jobs.append(('summary', name, threshold, config))
+        jobs += [('domain', name, threshold, domain, config) for domain in config['domains']]
+        jobs += [('residue', name, threshold, residue, config) for residue in config['residues']]
+
+    if config['n_workers'] == 1:
+        _init_worker(shared)
+        results = [_run_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=config['n_workers'], initializer=_init_worker,
+                                 initargs=(shared,)) as executor:
+            results = list(executor.map(_run_job, jobs))
+
+    return [path for paths in results for path in paths]
+
+#######################################################################################
+def main(argv=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Run the crosslinking analysis for every dataset, threshold, "
+                                                 "domain and residue listed in a JSON config.")
+    parser.add_argument('config', help="Path to the JSON config file.")
+    parser.add_argument('--output-dir', help="Overrides output_dir from the config.")
+    parser.add_argument('--n-workers', type=int, help="Number of worker processes (1 runs in this process).")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    if args.output_dir is not None:
+        config['output_dir'] = args.output_dir
+    if args.n_workers is not None:
+        config['n_workers'] = args.n_workers
+
+    written = run_batch(config)
+    print(f"Wrote {len(written)} files to {config['output_dir']}")
+
+#######################################################################################
+if __name__ == '__main__':
+    main()
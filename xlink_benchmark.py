@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Title: Benchmarks for the Crosslinking Analysis Functions
+Date: October 2026
+Description:
+    Times the public xlink_analysis_functions on synthetic crosslink tables drawn from the apoB100 lysines
+    at increasing sizes, records the peak memory of each call and writes the results as JSON so runs can
+    be compared for regressions.
+
+    Usage: python xlink_benchmark.py [--sizes 1e3 1e4 1e5 1e6 1e7] [--output benchmark_results.json]
+                                     [--repeats 3] [--time-budget 60] [--trace-memory-max-rows 1e6]
+                                     [--baseline old_results.json]
+"""
+
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+
+import xlink_analysis_functions as xlf
+
+#######################################################################################
+def synthetic_crosslinks(n_rows, sequence=None, domain_ranges=None, seed=0):
+    """
+    Generates a crosslink table shaped like the shipped CSV files: random lysine pairs of a sequence with
+    spectral counts, two model CA distances and their average, sequence distances and domain associations.
+    Pairs repeat once n_rows exceeds the number of lysine pairs, as redundant CSMs would.
+
+    Args:
+        n_rows (int): Number of rows.
+        sequence (str, optional): Protein sequence whose lysines are paired. Defaults to APOB100_SEQUENCE.
+        domain_ranges (dict, optional): Domain map. Defaults to APOB100_DOMAIN_RANGES.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: The synthetic crosslink table.
+    """
+    if sequence is None:
+        sequence = xlf.APOB100_SEQUENCE
+
+    rng = np.random.default_rng(seed)
+    lysines = np.flatnonzero(np.frombuffer(sequence.encode('ascii'), dtype=np.uint8) == ord('K')) + 1
+    first = lysines[rng.integers(0, len(lysines), n_rows)]
+    # Draw the partner from the other lysines so no residue is paired with itself
+    second = lysines[(np.searchsorted(lysines, first) + rng.integers(1, len(lysines), n_rows)) % len(lysines)]
+
+    distances = rng.gamma(shape=4.0, scale=8.0, size=(2, n_rows))
+    xlinks_df = pd.DataFrame({
+        'Residue1': np.minimum(first, second),
+        'Residue2': np.maximum(first, second),
+        'Spectral Count': rng.geometric(0.15, n_rows),
+        'CA Distance mod1': distances[0],
+        'CA Distance mod2': distances[1],
+        'CA Distance': distances.mean(axis=0)
+    })
+    xlinks_df['Sequence Distance'] = xlinks_df['Residue2'] - xlinks_df['Residue1']
+
+    annotated_df = xlf.annotate_domains(xlinks_df, domain_ranges)
+    return annotated_df.drop(columns=['Domain1', 'Domain2'])
+
+#######################################################################################
+def benchmark_cases(df):
+    """
+    Returns the benchmarked calls on one synthetic table as (name, function of no arguments) pairs.
+    """
+    index = xlf.CrosslinkIndex(df)
+    half = len(df) // 2
+    residue = int(df['Residue1'].iloc[0])
+
+    return [
+        ('annotate_domains', lambda: xlf.annotate_domains(df)),
+        ('domain_crosslink_stats', lambda: xlf.domain_crosslink_stats(df, xlf.APOB100_SEQUENCE)),
+        ('summarize_by_domain_association', lambda: xlf.summarize_by_domain_association(df)),
+        ('summarize_by_domain_association (no lists)',
+         lambda: xlf.summarize_by_domain_association(df, include_lists=False)),
+        ('sweep_domain_association_thresholds',
+         lambda: xlf.sweep_domain_association_thresholds(df, [20, 26, 50], [1, 10, 20])),
+        ('merge_crosslink_datasets', lambda: xlf.merge_crosslink_datasets([df.iloc[:half], df.iloc[half:]])),
+        ('filter_by_spectral_count', lambda: xlf.filter_by_spectral_count(df, 10)),
+        ('filter_by_domain', lambda: xlf.filter_by_domain(df, 'insert 9', exclude_intra_domain=False)),
+        ('filter_by_ca_distance', lambda: xlf.filter_by_ca_distance(df, 26, 'less')),
+        ('filter_by_residue', lambda: xlf.filter_by_residue(df, residue)),
+        ('filter_by_residue (index)', lambda: xlf.filter_by_residue(df, residue, index=index)),
+        ('XlinkQuery', lambda: xlf.XlinkQuery(df).spectral(10).domain('insert 9').ca(26).collect()),
+        ('CrosslinkIndex', lambda: xlf.CrosslinkIndex(df)),
+        ('format_chimera_dist_selection', lambda: xlf.format_chimera_dist_selection(df, [1, 2])),
+        ('ca_distance_ecdf', lambda: xlf.ca_distance_ecdf(df))
+    ]
+
+#######################################################################################
+def _time_call(function, repeats, trace_memory=True):
+    """
+    Returns the best wall time of several calls, the peak traced memory of one more call (None when
+    trace_memory is False) and the wall time of that traced call (0 when it is not run).
+    """
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+
+    if not trace_memory:
+        return min(seconds), None, 0.0
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        function()
+        traced_seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(seconds), peak, traced_seconds
+
+#######################################################################################
+def run_benchmarks(sizes=(1_000, 10_000, 100_000, 1_000_000, 10_000_000), repeats=3, time_budget=60, seed=0,
+                   trace_memory_max_rows=1_000_000, verbose=True):
+    """
+    Runs every benchmark case at every table size. Once a case takes longer than time_budget seconds it is
+    skipped at the larger sizes. Tracing memory slows a call down many times over, so the traced call counts
+    against the budget too and is skipped on tables larger than trace_memory_max_rows.
+
+    Args:
+        sizes (list): Numbers of rows of the synthetic tables.
+        repeats (int): Timed calls per case; the best is reported.
+        time_budget (float): Seconds per call (timed or traced) above which a case is not run at larger sizes.
+        seed (int): Seed of the synthetic tables.
+        trace_memory_max_rows (int, optional): Largest table whose peak memory is traced; None traces every size.
+        verbose (bool): Print each result as it is measured.
+
+    Returns:
+        dict: Run metadata and a 'results' list with one record per function and size ('function', 'rows',
+              'seconds', 'peak_memory_bytes' (None when not traced), and 'skipped' for cases over the time
+              budget).
+    """
+    results = []
+    over_budget = set()
+
+    for n_rows in sizes:
+        df = synthetic_crosslinks(int(n_rows), seed=seed)
+        for name, function in benchmark_cases(df):
+            if name in over_budget:
+                results.append({'function': name, 'rows': int(n_rows), 'skipped': True})
+                continue
+
+            trace_memory = trace_memory_max_rows is None or n_rows <= trace_memory_max_rows
+            seconds, peak, traced_seconds = _time_call(function, repeats if n_rows < 10_000_000 else 1, trace_memory)
+            results.append({'function': name, 'rows': int(n_rows), 'seconds': seconds, 'peak_memory_bytes': peak})
+            if max(seconds, traced_seconds) > time_budget:
+                over_budget.add(name)
+            if verbose:
+                memory = "not traced" if peak is None else f"{peak / 2 ** 20:.1f} MiB"
+                print(f"{name:45s} {int(n_rows):>10d} rows {seconds:10.4f} s {memory:>12s}")
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.platform(),
+        'repeats': repeats,
+        'trace_memory_max_rows': trace_memory_max_rows,
+        'results': results
+    }
+
+#######################################################################################
+def compare_results(baseline, current):
+    """
+    Compares two benchmark runs, e.g. to flag regressions against a stored baseline.
+
+    Args:
+        baseline (dict): Results from run_benchmarks (or its JSON file) to compare against.
+        current (dict): Results of the new run.
+
+    Returns:
+        pd.DataFrame: One row per function and size measured in both runs, with both times, both peak memories
+                      and the 'Time Ratio' / 'Memory Ratio' of current over baseline ('Memory Ratio' is NaN where
+                      either run did not trace memory).
+    """
+    def _table(run):
+        records = [record for record in run['results'] if not record.get('skipped')]
+        table_df = pd.DataFrame(records, columns=['function', 'rows', 'seconds', 'peak_memory_bytes'])
+        table_df['peak_memory_bytes'] = pd.to_numeric(table_df['peak_memory_bytes']).astype(float)
+        return table_df
+
+    comparison_df = _table(baseline).merge(_table(current), on=['function', 'rows'], suffixes=(' baseline', ' current'))
+    comparison_df['Time Ratio'] = comparison_df['seconds current'] / comparison_df['seconds baseline']
+    comparison_df['Memory Ratio'] = comparison_df['peak_memory_bytes current'] / comparison_df['peak_memory_bytes baseline']
+
+    return comparison_df
+
+#######################################################################################
+def main(argv=None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the crosslinking analysis functions on synthetic tables.")
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e3, 1e4, 1e5, 1e6, 1e7],
+                        help="Numbers of rows of the synthetic tables.")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file the results are written to.")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed calls per case; the best is reported.")
+    parser.add_argument('--time-budget', type=float, default=60,
+                        help="Seconds per call above which a case is skipped at larger sizes.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic tables.")
+    parser.add_argument('--trace-memory-max-rows', type=float, default=1e6,
+                        help="Largest table whose peak memory is traced (tracing is slow); 0 disables tracing.")
+    parser.add_argument('--baseline', help="Earlier results JSON to compare against.")
+    args = parser.parse_args(argv)
+
+    run = run_benchmarks([int(size) for size in args.sizes], repeats=args.repeats, time_budget=args.time_budget,
+                         seed=args.seed, trace_memory_max_rows=int(args.trace_memory_max_rows))
+    with open(args.output, 'w') as handle:
+        json.dump(run, handle, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        comparison_df = compare_results(baseline, run)
+        print(comparison_df[['function', 'rows', 'Time Ratio', 'Memory Ratio']].to_string(index=False))
+
+#######################################################################################
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Title: Random Lysine-Pair Background Statistics
+Date: October 2026
+Description:
+    This module compares crosslinks against a null model of random lysine pairs drawn with the same
+    sequence distance distribution, reporting per domain association enrichment and empirical p-values
+"""
+
+import numpy as np
+import pandas as pd
+
+import xlink_analysis_functions as xlf
+import xlink_structure_functions as xsf
+
+#######################################################################################
+def lysine_residues(sequence):
+    """
+    Returns the 1-based residue numbers of the lysines in a protein sequence (or a ProteinAnnotation).
+    """
+    if isinstance(sequence, xlf.ProteinAnnotation):
+        return sequence.lysine_residues
+    return xlf.get_protein_annotation(sequence).lysine_residues
+
+#######################################################################################
+def _resolve_domain_ranges(sequence, domain_ranges):
+    """
+    Returns domain_ranges, or the domain map of sequence when it is a ProteinAnnotation and none is given.
+    """
+    if domain_ranges is None and isinstance(sequence, xlf.ProteinAnnotation):
+        return sequence.domain_ranges
+    return domain_ranges
+
+#######################################################################################
+def lysine_pair_background(sequence, coordinates, domain_ranges=None, combine='min'):
+    """
+    Builds the pool of every lysine pair in a sequence that has coordinates in the models.
+
+    Args:
+        sequence (str or ProteinAnnotation): Protein sequence or its annotation.
+        coordinates (np.ndarray or list): Model coordinates, as accepted by xsf.add_ca_distances.
+        domain_ranges (dict, optional): Domain map used for the associations. Defaults to the domain map of an
+                                        annotation, otherwise APOB100_DOMAIN_RANGES.
+        combine (str): How the models are combined into 'CA Distance' (see xsf.add_ca_distances).
+
+    Returns:
+        pd.DataFrame: One row per pair (Residue1 < Residue2) with CA distance, 'Sequence Distance' and domain columns.
+    """
+    lysines = lysine_residues(sequence)
+    first, second = np.triu_indices(len(lysines), k=1)
+    pairs_df = pd.DataFrame({'Residue1': lysines[first], 'Residue2': lysines[second]})
+
+    pairs_df = xsf.add_ca_distances(pairs_df, coordinates, combine=combine)
+    pairs_df = pairs_df[pairs_df['CA Distance'].notna()].reset_index(drop=True)
+
+    return xlf.annotate_domains(pairs_df, _resolve_domain_ranges(sequence, domain_ranges))
+
+#######################################################################################
+def _observed_pairs(df, coordinates, domain_ranges, combine):
+    """
+    Unique canonical crosslinks of df with CA distances from the models and domain columns; pairs without
+    coordinates are left out.
+    """
+    low, high = xlf.unpack_canonical_pair_keys(pd.unique(xlf.canonical_pair_keys(df)))
+    pairs_df = pd.DataFrame({'Residue1': low, 'Residue2': high})
+
+    pairs_df = xsf.add_ca_distances(pairs_df, coordinates, combine=combine)
+    pairs_df = pairs_df[pairs_df['CA Distance'].notna()].reset_index(drop=True)
+
+    return xlf.annotate_domains(pairs_df, domain_ranges)
+
+#######################################################################################
+def _sequence_distance_strata(observed_distances, pool_distances, sequence_distance_bins):
+    """
+    Bins the observed and pool sequence distances into common strata.
+
+    Returns:
+        tuple: Stratum of each observed pair, and the pool positions sorted by stratum with the start and size
+               of each stratum in that order, so a matched draw is order[start + floor(u * size)].
+    """
+    if np.ndim(sequence_distance_bins) == 0:
+        quantiles = np.linspace(0, 1, int(sequence_distance_bins) + 1)
+        edges = np.unique(np.quantile(observed_distances, quantiles))
+    else:
+        edges = np.unique(np.asarray(sequence_distance_bins, dtype=float))
+    # Make the last edge inclusive
+    edges = np.append(edges[:-1], edges[-1] + 1)
+    n_strata = len(edges) - 1
+
+    observed_strata = np.searchsorted(edges, observed_distances, side='right') - 1
+    if ((observed_strata < 0) | (observed_strata >= n_strata)).any():
+        raise ValueError("sequence_distance_bins must cover the sequence distances of every crosslink.")
+
+    pool_strata = np.searchsorted(edges, pool_distances, side='right') - 1
+    in_strata = np.flatnonzero((pool_strata >= 0) & (pool_strata < n_strata))
+    order = in_strata[np.argsort(pool_strata[in_strata], kind='stable')]
+    sizes = np.bincount(pool_strata[in_strata], minlength=n_strata)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    if (sizes[observed_strata] == 0).any():
+        raise ValueError("Some sequence distance bins contain crosslinks but no lysine pairs; use wider bins.")
+
+    return observed_strata, order, starts, sizes
+
+#######################################################################################
+def _matched_draws(rng, n_sets, observed_strata, order, starts, sizes):
+    """
+    Draws n_sets random sets of pool positions, each set matching the observed pairs stratum by stratum.
+
+    Returns:
+        np.ndarray: Pool positions of shape (n_sets, n_observed).
+    """
+    offsets = (rng.random((n_sets, len(observed_strata))) * sizes[observed_strata]).astype(np.int64)
+    return order[starts[observed_strata] + offsets]
+
+#######################################################################################
+def matched_random_lysine_pairs(df, sequence, coordinates, n_pairs, sequence_distance_bins=20, domain_ranges=None,
+                                combine='min', seed=0):
+    """
+    Draws random lysine pairs whose sequence distances follow those of the crosslinks, e.g. to plot a
+    background curve with xlf.plot_ca_distance_cumulative_percentage.
+
+    Args:
+        df (pd.DataFrame): Crosslink DataFrame with 'Residue1' and 'Residue2' columns.
+        sequence (str or ProteinAnnotation): Protein sequence whose lysines form the background, or its annotation.
+        coordinates (np.ndarray or list): Model coordinates, as accepted by xsf.add_ca_distances.
+        n_pairs (int): Number of random pairs to draw.
+        sequence_distance_bins (int or list): Number of quantile bins of the crosslink sequence distances,
+                                              or explicit bin edges, within which pairs are matched.
+        domain_ranges (dict, optional): Domain map. Defaults to the domain map of an annotation, otherwise
+                                        APOB100_DOMAIN_RANGES.
+        combine (str): How the models are combined into 'CA Distance' (see xsf.add_ca_distances).
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: The drawn pairs (with replacement), with the columns of lysine_pair_background.
+    """
+    domain_ranges = _resolve_domain_ranges(sequence, domain_ranges)
+    observed_df = _observed_pairs(df, coordinates, domain_ranges, combine)
+    pool_df = lysine_pair_background(sequence, coordinates, domain_ranges, combine)
+    observed_strata, order, starts, sizes = _sequence_distance_strata(
+        observed_df['Sequence Distance'].to_numpy(), pool_df['Sequence Distance'].to_numpy(), sequence_distance_bins)
+
+    rng = np.random.default_rng(seed)
+    # Pick a crosslink to match for each draw, then a random pair from its stratum
+    strata = observed_strata[rng.integers(0, len(observed_strata), n_pairs)]
+    positions = _matched_draws(rng, 1, strata, order, starts, sizes)[0]
+
+    return pool_df.iloc[positions].reset_index(drop=True)
+
+#######################################################################################
+def random_background_stats(df, sequence, coordinates, n_replicates=10_000, ca_distance_cutoff=26,
+                            sequence_distance_bins=20, domain_ranges=None, combine='min', chunk_draws=2_000_000,
+                            seed=0):
+    """
+    Compares crosslinks with random lysine pairs of matched sequence distance. Each replicate draws one
+    random pair per unique crosslink from the same sequence distance bin; replicates are drawn in chunks of
+    about chunk_draws pairs, so memory stays bounded however many replicates are requested.
+
+    Args:
+        df (pd.DataFrame): Crosslink DataFrame with 'Residue1' and 'Residue2' columns.
+        sequence (str or ProteinAnnotation): Protein sequence whose lysines form the background, or its annotation.
+        coordinates (np.ndarray or list): Model coordinates, as accepted by xsf.add_ca_distances. Crosslink
+                                          distances are taken from the same models as the background.
+        n_replicates (int): Number of random crosslink sets.
+        ca_distance_cutoff (float): CA distance at or below which a pair counts as satisfied.
+        sequence_distance_bins (int or list): Number of quantile bins of the crosslink sequence distances,
+                                              or explicit bin edges, within which pairs are matched.
+        domain_ranges (dict, optional): Domain map. Defaults to the domain map of an annotation, otherwise
+                                        APOB100_DOMAIN_RANGES.
+        combine (str): How the models are combined into 'CA Distance' (see xsf.add_ca_distances).
+        chunk_draws (int): Approximate number of random pairs drawn per chunk.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: An 'All' row followed by one row per domain association with crosslinks or background pairs:
+                      observed and expected crosslink counts, their ratio ('Enrichment') and the empirical one-sided
+                      p-value of a count at least as high, and the observed and expected percentage of pairs at or
+                      below the CA distance cutoff with the p-value of a percentage at least as high.
+    """
+    domain_ranges = _resolve_domain_ranges(sequence, domain_ranges)
+    observed_df = _observed_pairs(df, coordinates, domain_ranges, combine)
+    pool_df = lysine_pair_background(sequence, coordinates, domain_ranges, combine)
+    observed_strata, order, starts, sizes = _sequence_distance_strata(
+        observed_df['Sequence Distance'].to_numpy(), pool_df['Sequence Distance'].to_numpy(), sequence_distance_bins)
+
+    # Association codes, with one extra slot for pairs outside every domain
+    associations = list(observed_df['Domain Association'].cat.categories)
+    n_slots = len(associations) + 1
+    observed_codes = np.where(observed_df['Domain Association'].cat.codes < 0, n_slots - 1,
+                              observed_df['Domain Association'].cat.codes)
+    pool_codes = np.where(pool_df['Domain Association'].cat.codes < 0, n_slots - 1,
+                          pool_df['Domain Association'].cat.codes)
+    observed_satisfied = observed_df['CA Distance'].to_numpy() <= ca_distance_cutoff
+    pool_satisfied = pool_df['CA Distance'].to_numpy() <= ca_distance_cutoff
+
+    n_observed = len(observed_df)
+    observed_counts = np.bincount(observed_codes, minlength=n_slots)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        observed_fraction = np.bincount(observed_codes, weights=observed_satisfied, minlength=n_slots) / observed_counts
+    observed_all_fraction = observed_satisfied.mean()
+
+    count_sum = np.zeros(n_slots)
+    count_at_least = np.zeros(n_slots)
+    satisfied_sum = np.zeros(n_slots)
+    fraction_at_least = np.zeros(n_slots)
+    fraction_valid = np.zeros(n_slots)
+    all_fraction_sum = 0.0
+    all_fraction_at_least = 0
+
+    rng = np.random.default_rng(seed)
+    sets_per_chunk = max(1, chunk_draws // max(n_observed, 1))
+    for chunk_start in range(0, n_replicates, sets_per_chunk):
+        n_sets = min(sets_per_chunk, n_replicates - chunk_start)
+        positions = _matched_draws(rng, n_sets, observed_strata, order, starts, sizes)
+
+        # Per-replicate association counts from one bincount over (replicate, association) codes
+        flat_codes = (np.arange(n_sets)[:, None] * n_slots + pool_codes[positions]).ravel()
+        satisfied = pool_satisfied[positions]
+        counts = np.bincount(flat_codes, minlength=n_sets * n_slots).reshape(n_sets, n_slots)
+        satisfied_counts = np.bincount(flat_codes, weights=satisfied.ravel(),
+                                       minlength=n_sets * n_slots).reshape(n_sets, n_slots)
+
+        count_sum += counts.sum(axis=0)
+        count_at_least += (counts >= observed_counts).sum(axis=0)
+        satisfied_sum += satisfied_counts.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fractions = satisfied_counts / counts
+        fraction_at_least += (fractions >= observed_fraction).sum(axis=0)
+        fraction_valid += (counts > 0).sum(axis=0)
+
+        all_fractions = satisfied.mean(axis=1)
+        all_fraction_sum += all_fractions.sum()
+        all_fraction_at_least += int((all_fractions >= observed_all_fraction).sum())
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        expected_counts = count_sum / n_replicates
+        expected_fraction = satisfied_sum / count_sum
+        enrichment = observed_counts / expected_counts
+        fraction_p_values = (1 + fraction_at_least) / (1 + fraction_valid)
+    count_p_values = (1 + count_at_least) / (1 + n_replicates)
+
+    cutoff_label = f'% CA Distance <= {ca_distance_cutoff}'
+    rows = [{
+        'Domain Association': 'All',
+        'Observed Crosslinks': n_observed,
+        'Expected Crosslinks': float(n_observed),
+        'Enrichment': 1.0,
+        'Enrichment p-value': 1.0,
+        f'Observed {cutoff_label}': observed_all_fraction * 100,
+        f'Expected {cutoff_label}': all_fraction_sum / n_replicates * 100,
+        'CA Distance p-value': (1 + all_fraction_at_least) / (1 + n_replicates)
+    }]
+    for code in sorted(range(len(associations)), key=lambda code: associations[code]):
+        if observed_counts[code] == 0 and count_sum[code] == 0:
+            continue
+        rows.append({
+            'Domain Association': associations[code],
+            'Observed Crosslinks': int(observed_counts[code]),
+            'Expected Crosslinks': expected_counts[code],
+            'Enrichment': enrichment[code],
+            'Enrichment p-value': count_p_values[code],
+            f'Observed {cutoff_label}': observed_fraction[code] * 100,
+            f'Expected {cutoff_label}': expected_fraction[code] * 100,
+            'CA Distance p-value': fraction_p_values[code] if observed_counts[code] else np.nan
+        })
+
+    return pd.DataFrame(rows)
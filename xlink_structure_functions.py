@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Title: Crosslink Distances From Structural Models
+Date: October 2026
+Description:
+    This module reads C-alpha coordinates from PDB/mmCIF models and computes the CA distance columns
+    used by xlink_analysis_functions directly from the structures
+"""
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+#######################################################################################
+def _read_pdb_ca_atoms(file_path, chain):
+    """
+    Yields (residue number, x, y, z) for the C-alpha atoms of the first model in a PDB file.
+    """
+    with open(file_path) as handle:
+        for line in handle:
+            record = line[:6]
+            if record == 'ENDMDL':
+                break
+            if record not in ('ATOM  ', 'HETATM') or line[12:16].strip() != 'CA':
+                continue
+            if line[16] not in (' ', 'A') or (chain is not None and line[21] != chain):
+                continue
+            yield int(line[22:26]), float(line[30:38]), float(line[38:46]), float(line[46:54])
+
+#######################################################################################
+def _read_mmcif_ca_atoms(file_path, chain):
+    """
+    Yields (residue number, x, y, z) for the C-alpha atoms of the first model in an mmCIF file.
+    """
+    fields = []
+    in_atom_site = False
+    with open(file_path) as handle:
+        for line in handle:
+            if line.startswith('_atom_site.'):
+                in_atom_site = True
+                fields.append(line.split()[0][len('_atom_site.'):])
+                continue
+            if not in_atom_site or not fields or line.startswith('loop_'):
+                continue
+            if line.startswith(('#', '_')):
+                break
+
+            values = line.split()
+            if len(values) != len(fields):
+                continue
+            atom = dict(zip(fields, values))
+
+            if atom.get('auth_atom_id', atom.get('label_atom_id')).strip('"') != 'CA':
+                continue
+            if atom.get('label_alt_id', '.') not in ('.', '?', 'A'):
+                continue
+            if atom.get('pdbx_PDB_model_num', '1') != '1':
+                break
+            if chain is not None and atom.get('auth_asym_id', atom.get('label_asym_id')) != chain:
+                continue
+            yield (int(atom.get('auth_seq_id', atom.get('label_seq_id'))),
+                   float(atom['Cartn_x']), float(atom['Cartn_y']), float(atom['Cartn_z']))
+
+#######################################################################################
+def read_ca_coordinates(file_path, chain=None):
+    """
+    Reads the C-alpha coordinates of a PDB or mmCIF model into an array indexed by residue number.
+
+    Args:
+        file_path (str): Path to a .pdb/.ent or .cif/.mmcif file. Only the first model is read.
+        chain (str, optional): Chain identifier to read. If None, every chain is read (the first C-alpha
+                               seen for a residue number is kept).
+
+    Returns:
+        np.ndarray: Array of shape (max residue number + 1, 3); row r holds the CA coordinates of residue r,
+                    NaN where the model has no C-alpha for that residue number. Residues numbered below 0
+                    (e.g. N-terminal tags) are left out.
+    """
+    if file_path.lower().endswith(('.cif', '.mmcif')):
+        atoms = _read_mmcif_ca_atoms(file_path, chain)
+    else:
+        atoms = _read_pdb_ca_atoms(file_path, chain)
+
+    atoms = np.array(list(atoms), dtype=float).reshape(-1, 4)
+    # Negative residue numbers would index from the end of the array
+    atoms = atoms[atoms[:, 0] >= 0]
+    if len(atoms) == 0:
+        raise ValueError(f"No C-alpha atoms found in {file_path}.")
+
+    residues = atoms[:, 0].astype(np.int64)
+    coordinates = np.full((residues.max() + 1, 3), np.nan)
+    # Write in reverse so the first C-alpha listed for a residue number wins
+    coordinates[residues[::-1]] = atoms[::-1, 1:]
+
+    return coordinates
+
+#######################################################################################
+def stack_ca_coordinates(models):
+    """
+    Stacks several models into one coordinate array, padding shorter models with NaN.
+
+    Args:
+        models (list): Per-model coordinate arrays (see read_ca_coordinates) or paths to model files.
+
+    Returns:
+        np.ndarray: Array of shape (n_models, n_residues, 3) indexed by model and residue number.
+    """
+    models = [read_ca_coordinates(model) if isinstance(model, str) else np.asarray(model, dtype=float)
+              for model in models]
+    stacked = np.full((len(models), max(len(model) for model in models), 3), np.nan)
+    for i, model in enumerate(models):
+        stacked[i, :len(model)] = model
+
+    return stacked
+
+#######################################################################################
+def ca_distances(coordinates, residue1, residue2):
+    """
+    Computes CA-CA distances for residue pairs with one vectorized gather.
+
+    Args:
+        coordinates (np.ndarray): Coordinates of shape (n_residues, 3) or (n_models, n_residues, 3).
+        residue1 (np.ndarray): First residue number of each pair.
+        residue2 (np.ndarray): Second residue number of each pair.
+
+    Returns:
+        np.ndarray: Distances of shape (n_pairs,) or (n_models, n_pairs); NaN where a residue has no coordinates.
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    n_residues = coordinates.shape[-2]
+    residue1 = np.asarray(residue1, dtype=np.int64)
+    residue2 = np.asarray(residue2, dtype=np.int64)
+
+    # Residues outside the model are pointed at a NaN padding row
+    padded = np.concatenate([coordinates, np.full(coordinates.shape[:-2] + (1, 3), np.nan)], axis=-2)
+    index1 = np.where((residue1 >= 0) & (residue1 < n_residues), residue1, n_residues)
+    index2 = np.where((residue2 >= 0) & (residue2 < n_residues), residue2, n_residues)
+
+    return np.linalg.norm(padded[..., index1, :] - padded[..., index2, :], axis=-1)
+
+#######################################################################################
+def add_ca_distances(df, coordinates, combine='min'):
+    """
+    Adds per-model CA distance columns and a combined 'CA Distance' column to a crosslink DataFrame.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'Residue1' and 'Residue2' columns.
+        coordinates (np.ndarray or list): Coordinates of shape (n_residues, 3) or (n_models, n_residues, 3),
+                                          or a list of models / model file paths (see stack_ca_coordinates).
+        combine (str): How the models are combined into 'CA Distance': 'min' or 'mean' (NaN models are ignored).
+
+    Returns:
+        pd.DataFrame: A copy of the DataFrame with 'CA Distance mod1' ... 'CA Distance mod<N>' and 'CA Distance'
+                      columns, plus 'Sequence Distance' if it was missing, ready for filter_by_ca_distance and
+                      summarize_by_domain_association.
+    """
+    if 'Residue1' not in df.columns or 'Residue2' not in df.columns:
+        raise ValueError("DataFrame must include 'Residue1' and 'Residue2' columns.")
+    if combine not in ('min', 'mean'):
+        raise ValueError("combine must be 'min' or 'mean'.")
+
+    if isinstance(coordinates, list):
+        coordinates = stack_ca_coordinates(coordinates)
+    coordinates = np.asarray(coordinates, dtype=float)
+    if coordinates.ndim == 2:
+        coordinates = coordinates[None]
+
+    residue1 = df['Residue1'].to_numpy()
+    residue2 = df['Residue2'].to_numpy()
+    distances = ca_distances(coordinates, residue1, residue2)
+
+    distance_df = df.copy()
+    for i, model_distances in enumerate(distances):
+        distance_df[f'CA Distance mod{i + 1}'] = model_distances
+    with np.errstate(invalid='ignore'):
+        distance_df['CA Distance'] = np.fmin.reduce(distances, axis=0) if combine == 'min' else np.nanmean(distances, axis=0)
+    if 'Sequence Distance' not in distance_df.columns:
+        distance_df['Sequence Distance'] = np.abs(residue2.astype(np.int64) - residue1.astype(np.int64))
+
+    return distance_df
+
+#######################################################################################
+def _memmap_layout(array):
+    """
+    Describes where a memory-mapped array (or any view of one) lives in its file, as (filename, dtype,
+    byte offset, shape, strides), so worker processes can map the same bytes instead of receiving them
+    pickled. Returns None for arrays that are not backed by a file mapping.
+    """
+    if not isinstance(array, np.memmap) or array.filename is None:
+        return None
+
+    # The root memmap's buffer is the mmap object, which starts at its offset rounded down to the
+    # allocation granularity; views keep the root's offset attribute
+    base = array
+    while base is not None and not isinstance(base, mmap.mmap):
+        base = base.base
+    if base is None:
+        return None
+    mapping_start = array.offset - array.offset % mmap.ALLOCATIONGRANULARITY
+    byte_offset = mapping_start + array.ctypes.data - np.frombuffer(base, dtype=np.uint8).ctypes.data
+
+    return array.filename, array.dtype.str, int(byte_offset), array.shape, array.strides
+
+#######################################################################################
+def _open_memmap_layout(layout):
+    """
+    Maps the array described by _memmap_layout read-only.
+    """
+    filename, dtype, byte_offset, shape, strides = layout
+    return np.ndarray(shape, dtype=dtype, buffer=np.memmap(filename, dtype=np.uint8, mode='r'),
+                      offset=byte_offset, strides=strides)
+
+#######################################################################################
+def _ensemble_chunk_stats(source, frame_start, frame_stop, residues, index1, index2, cutoff):
+    """
+    Computes partial distance statistics for one block of frames. Runs in worker processes; source is
+    either the block of frames already sliced to the crosslinked residues, or the path (str) or
+    _memmap_layout (tuple) of a memory-mapped ensemble, which is opened and sliced here.
+
+    Returns:
+        tuple: Per-pair minimum distance, frame of the minimum, distance sum, number of frames with a
+               distance and number of frames with distance <= cutoff, all over this block of frames.
+    """
+    if isinstance(source, (str, tuple)):
+        coordinates = np.load(source, mmap_mode='r') if isinstance(source, str) else _open_memmap_layout(source)
+        source = coordinates[frame_start:frame_stop][:, residues]
+
+    # The extra NaN column serves residues outside the model
+    block = np.asarray(source, dtype=float)
+    block = np.concatenate([block, np.full((len(block), 1, 3), np.nan)], axis=1)
+    distances = np.linalg.norm(block[:, index1] - block[:, index2], axis=-1)
+
+    has_distance = ~np.isnan(distances)
+    filled = np.where(has_distance, distances, np.inf)
+    best_frames = np.argmin(filled, axis=0)
+    minimums = filled[best_frames, np.arange(distances.shape[1])]
+
+    return (minimums, best_frames + frame_start, np.where(has_distance, distances, 0).sum(axis=0),
+            has_distance.sum(axis=0), (filled <= cutoff).sum(axis=0))
+
+#######################################################################################
+def ensemble_ca_distance_stats(df, coordinates, cutoff=26, combine='min', chunk_elements=50_000_000,
+                               n_workers=None):
+    """
+    Computes per-crosslink CA distance statistics over a conformational ensemble (MD or cryoDRGN frames),
+    streaming the frames in chunks and spreading the chunks over a process pool.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'Residue1' and 'Residue2' columns.
+        coordinates (str or np.ndarray): Path to a .npy file of shape (n_frames, n_residues, 3), opened as a
+                                         memory map, or an array (or np.memmap) of that shape indexed by
+                                         residue number.
+        cutoff (float): Distance in Angstroms used for 'Fraction Satisfied'.
+        combine (str): Statistic copied into 'CA Distance' so that filter_by_ca_distance and
+                       summarize_by_domain_association use it by default: 'min' or 'mean'.
+        chunk_elements (int): Approximate number of distances computed per chunk (frames x crosslinks).
+        n_workers (int, optional): Number of worker processes; None uses every CPU and 1 runs in this process.
+
+    Returns:
+        pd.DataFrame: A copy of the DataFrame with 'CA Distance min', 'CA Distance mean', 'Fraction Satisfied'
+                      (fraction of frames with distance <= cutoff), 'Best Frame' (frame of the minimum, -1 if
+                      no frame has both residues) and 'CA Distance' columns.
+    """
+    if 'Residue1' not in df.columns or 'Residue2' not in df.columns:
+        raise ValueError("DataFrame must include 'Residue1' and 'Residue2' columns.")
+    if combine not in ('min', 'mean'):
+        raise ValueError("combine must be 'min' or 'mean'.")
+
+    # Workers reopen memory maps from their file instead of receiving pickled frames
+    layout = coordinates if isinstance(coordinates, str) else _memmap_layout(coordinates)
+    if isinstance(coordinates, str):
+        coordinates = np.load(coordinates, mmap_mode='r')
+    n_frames, n_residues = coordinates.shape[:2]
+
+    # Map crosslinked residues onto a compact column set; residues outside the model point at the NaN column
+    residue1 = df['Residue1'].to_numpy(dtype=np.int64)
+    residue2 = df['Residue2'].to_numpy(dtype=np.int64)
+    residues, inverse = np.unique(np.concatenate([residue1, residue2]), return_inverse=True)
+    inside = (residues >= 0) & (residues < n_residues)
+    columns = np.where(inside, np.cumsum(inside) - 1, inside.sum())
+    index1, index2 = columns[inverse[:len(df)]], columns[inverse[len(df):]]
+    residues = residues[inside]
+
+    frames_per_chunk = max(1, chunk_elements // max(len(df), 1))
+    chunk_starts = list(range(0, n_frames, frames_per_chunk))
+
+    def chunk_args():
+        # In-memory ensembles are sliced here, so each worker receives only its frames and residues
+        for start in chunk_starts:
+            stop = min(start + frames_per_chunk, n_frames)
+            source = layout if layout is not None else coordinates[start:stop][:, residues]
+            yield source, start, stop, residues, index1, index2, cutoff
+
+    if n_workers == 1 or len(chunk_starts) <= 1:
+        results = [_ensemble_chunk_stats(*args) for args in chunk_args()]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count()) as executor:
+            futures = [executor.submit(_ensemble_chunk_stats, *args) for args in chunk_args()]
+            results = [future.result() for future in futures]
+
+    # Combine the chunk statistics; chunks are in frame order so ties keep the earliest frame
+    minimums = np.full(len(df), np.inf)
+    best_frames = np.full(len(df), -1, dtype=np.int64)
+    sums = np.zeros(len(df))
+    counts = np.zeros(len(df), dtype=np.int64)
+    satisfied = np.zeros(len(df), dtype=np.int64)
+    for chunk_minimums, chunk_best_frames, chunk_sums, chunk_counts, chunk_satisfied in results:
+        improved = chunk_minimums < minimums
+        minimums[improved] = chunk_minimums[improved]
+        best_frames[improved] = chunk_best_frames[improved]
+        sums += chunk_sums
+        counts += chunk_counts
+        satisfied += chunk_satisfied
+
+    stats_df = df.copy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats_df['CA Distance min'] = np.where(counts > 0, minimums, np.nan)
+        stats_df['CA Distance mean'] = np.where(counts > 0, sums / counts, np.nan)
+    stats_df['Fraction Satisfied'] = satisfied / max(n_frames, 1)
+    stats_df['Best Frame'] = best_frames
+    stats_df['CA Distance'] = stats_df[f'CA Distance {combine}']
+
+    return stats_df
+
+#######################################################################################
+def lysine_pairs_within(coordinates, max_distance, sequence=None, residues=None, combine='min'):
+    """
+    Finds every pair of lysines (or given residues) whose C-alphas lie within a distance in any model,
+    using a KD-tree per model.
+
+    Args:
+        coordinates (np.ndarray or list): Model coordinates, as accepted by add_ca_distances.
+        max_distance (float): Maximum CA-CA distance in Angstroms.
+        sequence (str, optional): Protein sequence; its lysines (1-based positions) are searched.
+        residues (list, optional): Residue numbers to search instead of the sequence lysines.
+        combine (str): How the models are combined into 'CA Distance' (see add_ca_distances).
+
+    Returns:
+        pd.DataFrame: One row per pair (Residue1 < Residue2) with 'Residue1', 'Residue2', per-model and combined
+                      CA distance columns and 'Sequence Distance'.
+    """
+    if residues is None:
+        if sequence is None:
+            raise ValueError("Either sequence or residues must be given.")
+        residues = np.flatnonzero(np.frombuffer(sequence.encode('ascii'), dtype=np.uint8) == ord('K')) + 1
+    residues = np.unique(np.asarray(residues, dtype=np.int64))
+
+    if isinstance(coordinates, list):
+        coordinates = stack_ca_coordinates(coordinates)
+    coordinates = np.asarray(coordinates, dtype=float)
+    if coordinates.ndim == 2:
+        coordinates = coordinates[None]
+
+    # Only residues with coordinates in a model go into that model's tree
+    residues = residues[(residues >= 0) & (residues < coordinates.shape[1])]
+    pair_keys = []
+    for model in coordinates:
+        present = residues[~np.isnan(model[residues]).any(axis=1)]
+        pairs = cKDTree(model[present]).query_pairs(max_distance, output_type='ndarray')
+        low = np.minimum(present[pairs[:, 0]], present[pairs[:, 1]])
+        high = np.maximum(present[pairs[:, 0]], present[pairs[:, 1]])
+        pair_keys.append((low << 32) | high)
+
+    pair_keys = np.unique(np.concatenate(pair_keys))
+    pairs_df = pd.DataFrame({'Residue1': pair_keys >> 32, 'Residue2': pair_keys & 0xFFFFFFFF})
+
+    return add_ca_distances(pairs_df, coordinates, combine=combine)